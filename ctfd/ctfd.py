@@ -3,9 +3,16 @@
 import argparse
 import argcomplete
 import os
+import re
+import sys
+import secrets
+import time
 import tabulate
 from .utils import *
 
+# Number of challenges downloaded between two saves of the snapshot and the search index
+SAVE_EVERY = 50
+
 def do_checks(args: argparse.Namespace, _config: dict, check_token: bool = False, check_challenges: bool = False):
 
     global config
@@ -35,37 +42,284 @@ def do_checks(args: argparse.Namespace, _config: dict, check_token: bool = False
             logger.error("No challenges found. Please run `ctfd sync` to fetch the challenges from CTFd.")
             exit(1)
 
-def check_downloaded_challenges(_chals: dict, chals_folder: str):
+def get_selected_targets(args: argparse.Namespace) -> dict:
     """
-    Check if the challenges are already downloaded. If they are, we'll update the attribute `is_downloaded` to True
-    for the challenges that are already downloaded.
+    Returns the targets selected using --target/--all-targets, or None if the command
+    should only run against the default CTFd instance.
     """
-    
-    if not os.path.exists(chals_folder):
+    if not args.all_targets and not args.targets:
+        return None
+
+    targets = get_targets(config)
+    if args.all_targets:
+        return targets
+
+    if unknown := [label for label in args.targets if label not in targets]:
+        logger.error(f"Unknown target(s): {', '.join(unknown)}. Use `ctfd target list` to list the configured targets.")
+        exit(1)
+
+    return {label: targets[label] for label in args.targets}
+
+def find_challenge(args: argparse.Namespace) -> ChallengeModel:
+    """
+    Returns the challenge selected using --challenge-id/--challenge-name from the configuration file.
+    """
+    if not args.chal_id and not args.chal_name:
+        logger.error("Please specify either challenge ID or challenge Name")
+        exit(1)
+
+    if not (challenges := config.get("Challenges", [])):
+        logger.error("No challenges found. Please run `ctfd sync` to fetch the challenges from CTFd.")
+        exit(1)
+
+    for challenge in challenges:
+        if (args.chal_name and challenge["name"] == args.chal_name) or (not args.chal_name and challenge["id"] == args.chal_id):
+            return ChallengeModel(**challenge)
+
+    logger.error(f"No challenge found for {'name ' + args.chal_name if args.chal_name else f'ID {args.chal_id}'}")
+    exit(1)
+
+def submit_and_record(ctfd: CTFd_Handler, ledger: Ledger, chal_id: int, flag: str) -> dict:
+    """
+    Submits the flag and appends the result (with the time CTFd took to answer) to the ledger.
+
+    Returns:
+        The response from the CTFd instance
+    """
+    started = time.monotonic()
+    resp = ctfd.submit_flag(chal_id, flag)
+    ledger.record(chal_id, flag, resp.get("status", ""), time.monotonic() - started)
+    return resp
+
+def flush_outbox(ctfd: CTFd_Handler, outbox: Outbox, ledger: Ledger) -> None:
+    """
+    Submits the flags queued while offline, in the order they were queued.
+    """
+    if not (pending := len(outbox.entries())):
         return
-    
-    for i in range(len(_chals)):
-        challenge = _chals[i]
-        # Based on the category:
-        category_folder = os.path.join(chals_folder, challenge["category"])
-        if not os.path.exists(category_folder):
-            continue
-
-        _name = challenge['name'].replace(" ", "-").lower()
-        chal_info = os.path.join(category_folder, f"{_name}/README.md")
-        if os.path.exists(chal_info):
-            challenge["is_downloaded"] = True
 
-def _get_path() -> str:
-    _path = os.path.join(os.getcwd(), ".ctfd")
-    if not os.path.exists(_path):
-        if os.path.exists("/tmp/.ctfd.cache"):
-            with open("/tmp/.ctfd.cache") as fp:
-                _path = fp.read().strip()
+    logger.info(f"Submitting {pending} queued flag(s)")
+    flushed = outbox.flush(lambda chal_id, flag: submit_and_record(ctfd, ledger, chal_id, flag))
+    for entry, resp in flushed:
+        resp = SubmissionModel.from_api(resp)
+        logger.info(f"Queued flag for challenge {entry['challenge_id']}: {resp.status} {resp.message}")
+
+    if len(flushed) != pending:
+        logger.warning(f"{pending - len(flushed)} flag(s) are still queued, use `ctfd outbox flush` to retry.")
+
+def print_scoreboard(scoreboards: dict, number: int) -> None:
+    """
+    Prints the scoreboard(s) as a single table, a Target column is added when more than one target is shown.
+    """
+    multi = len(scoreboards) > 1
+    headers = (["Target"] if multi else []) + ["Rank", "Team", "Score"]
+    table = []
+
+    for label, scoreboard in scoreboards.items():
+        for entry in ScoreboardEntryModel.from_top(scoreboard)[:number]:
+            table.append(([label] if multi else []) + [entry.pos, entry.name, entry.score])
+
+    print(tabulate.tabulate(table, headers, tablefmt="fancy_outline"))
+
+def check_downloaded_challenges(_chals: list, chals_folder: str, snapshot: Snapshot = None) -> dict:
+    """
+    Check if the challenges are already downloaded. If they are, we'll update the attribute `is_downloaded` to True
+    for the challenges that are already downloaded (see `scan_downloads`).
+
+    Returns:
+        Challenge id -> download state, for the challenges that have a folder
+    """
+    states = scan_downloads(_chals, chals_folder, snapshot)
+    for challenge in _chals:
+        challenge["is_downloaded"] = states.get(challenge["id"]) == DOWNLOADED
+    return states
+
+def index_challenge(index: SearchIndex, _chal: dict, chal_folder: str) -> None:
+    """
+    Adds the challenge details (as returned by the API) and its attachments to the search index.
+    The index still has to be saved by the caller.
+    """
+    files = [os.path.basename(file).split("?")[0] for file in _chal.get("files", [])]
+    index.add(_chal["id"], {
+        "name": _chal["name"],
+        "category": _chal.get("category", ""),
+        "description": _chal.get("description", ""),
+        "tags": " ".join(tag["value"] if isinstance(tag, dict) else tag for tag in _chal.get("tags", [])),
+        "hints": " ".join(hint.get("content", "") for hint in _chal.get("hints", []) if isinstance(hint, dict)),
+        "files": " ".join(files),
+    }, {"id": _chal["id"], "name": _chal["name"], "category": _chal.get("category", ""), "path": chal_folder})
+
+def rebuild_index(index: SearchIndex, snapshot: Snapshot, chals_folder: str) -> None:
+    """
+    Reindexes every challenge of the snapshot that is downloaded in `chals_folder`.
+    """
+    _chals = [entry["data"] for entry in snapshot.data.get("challenges", {}).values()]
+    states = scan_downloads(_chals, chals_folder)
+    for _chal in _chals:
+        _id = _chal["id"]
+        if _id in states:
+            index_challenge(index, _chal, challenge_folder(chals_folder, _chal.get("category", ""), _chal["name"]))
         else:
-            return None
-        
-    return os.path.join(_path, "config.json")
+            index.remove(_id)
+    index.save()
+
+def write_readme(chal_folder: str, _chal: dict, files: list) -> None:
+    """
+    Writes the README.md of a challenge from its details (as returned by the API) and its downloaded files.
+    """
+    with open(os.path.join(chal_folder, "README.md"), "w") as fp:
+        fp.write(f"# {_chal['name']}\n\n")
+        fp.write(f"**Category**: {_chal.get('category', '')}\n")
+        fp.write(f"**Points**: {_chal.get('value', '')}\n")
+        fp.write(f"**Description**:\n```md\n{_chal.get('description', '')}\n```\n")
+        if files:
+            fp.write(f"**Files**:\n")
+            for file in files:
+                fp.write(f"- [{os.path.basename(file)}]({file})\n")
+        if hints := [hint for hint in _chal.get("hints", []) if isinstance(hint, dict)]:
+            fp.write(f"**Hints**:\n")
+            for hint in hints:
+                if hint.get("content"):
+                    fp.write(f"- {hint['content']}\n")
+                else:
+                    fp.write(f"- Locked (costs {hint.get('cost', 0)} points), unlock it from the web UI\n")
+
+def refresh_readmes(_chals: dict, chals_folder: str) -> int:
+    """
+    Rewrites the README.md of the downloaded challenges among `_chals` (id -> details).
+
+    Returns:
+        The number of README.md rewritten
+    """
+    # Partial folders are left alone, writing their README.md would mark them as downloaded.
+    downloaded = [_id for _id, state in scan_downloads(list(_chals.values()), chals_folder).items() if state == DOWNLOADED]
+    for _id in downloaded:
+        _chal = _chals[_id]
+        chal_folder = challenge_folder(chals_folder, _chal.get("category", ""), _chal["name"])
+        files = [os.path.join(chal_folder, os.path.basename(file).split("?")[0]) for file in _chal.get("files", [])]
+        write_readme(chal_folder, _chal, [file for file in files if os.path.isfile(file)])
+    return len(downloaded)
+
+def fresh_link(ctfd: CTFd_Handler, chal_id: int, file: str) -> str:
+    """
+    Fetches the details of the challenge from CTFd itself (never the mirror) to get a new link for `file`.
+    The snapshot is left as is (it has the unlocked hints), its entry is old enough to be fetched again.
+
+    Returns:
+        The new link, None if CTFd didn't hand out a different one
+    """
+    if not (_chal := ctfd.get_challenge(chal_id, mirror=False)):
+        return None
+
+    path = file.split("?")[0]
+    return next((_file for _file in _chal.get("files", []) if _file.split("?")[0] == path and _file != file), None)
+
+def download_challenge(ctfd: CTFd_Handler, chal: ChallengeModel, chals_folder: str, config_dir: str, snapshot: Snapshot, index: SearchIndex, refresh: bool = True, downloads: dict = None) -> bool:
+    """
+    Downloads the challenge details and attachments into `chals_folder/<category>/<name>/`, writes its
+    README.md and copies submit.sh (and launch.sh for container challenges) to it.
+
+    The details prefetched by `sync` are used unless `refresh` is set. The sizes of the attachments are
+    added to `downloads` if given, for the caller to store them along with the others (the snapshot is
+    rewritten entirely on every write), they're stored in the snapshot right away otherwise.
+
+    Returns:
+        True if the challenge was downloaded, False otherwise
+    """
+    _config = os.path.join(config_dir, "config.json")
+    if not refresh and (_chal := snapshot.get("challenges", chal.id)[0]):
+        logger.info(f"Using the prefetched details of {chal}")
+    else:
+        _chal, updated = ctfd.fetch_challenge(chal.id)
+
+        if not _chal:
+            logger.error(f"Could not download {chal}")
+            return False
+        snapshot.put("challenges", chal.id, _chal, updated)
+
+    chal_folder = challenge_folder(chals_folder, _chal["category"], _chal["name"])
+    os.makedirs(chal_folder, exist_ok=True)
+
+    _files = []
+    if files := _chal.get("files", []):
+        for file in files:
+            filename = os.path.basename(file).split("?")[0]
+            logger.info(f"Downloading challenge file: {filename} for {_chal['name']}")
+
+            file_path = os.path.join(chal_folder, filename)
+            try:
+                try:
+                    ctfd.download_file(file, file_path)
+                except Exception as E:
+                    # The link expired (e.g. details handed out by the team mirror), CTFd signs a new one.
+                    if getattr(getattr(E, "response", None), "status_code", None) != 403 or not (file := fresh_link(ctfd, chal.id, file)):
+                        raise
+                    ctfd.download_file(file, file_path)
+            except Exception as E:
+                # No README.md is written, so the challenge shows up as partial and is retried next time.
+                logger.error(f"Could not download {filename} for {_chal['name']}: {E.__str__()}")
+                return False
+            _files.append(file_path)
+
+    # Recorded before the README.md is written, see `scan_downloads`
+    stats = file_stats(chal_folder, [os.path.basename(file) for file in _files])
+    if downloads is None:
+        snapshot.put("downloads", chal.id, stats)
+    else:
+        downloads[chal.id] = stats
+
+    write_readme(chal_folder, _chal, _files)
+
+    index_challenge(index, _chal, chal_folder)
+    update_challenge(_config, chal.id, "is_downloaded", True)
+    logger.info(f"Successfully downloaded {chal.name}")
+
+    submit_sh_template = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates/submit.sh")
+
+    update_template(submit_sh_template, os.path.join(chal_folder, "submit.sh"), chal.id, config_dir)
+
+    if chal.type == "container":
+        launch_sh_template = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates/launch.sh")
+        update_template(launch_sh_template, os.path.join(chal_folder, "launch.sh"), chal.id, config_dir)
+
+    logger.info(f"Successfully copied submit.sh {'and launch.sh' if chal.type == 'container' else ''} to {chal_folder}")
+    return True
+
+def prefetch_challenges(ctfd: CTFd_Handler, _chals: list, snapshot: Snapshot, chals_folder: str, force: bool = False) -> None:
+    """
+    Prefetches the details and hints of the challenges (see `prefetch`) and updates the README.md of
+    the downloaded challenges that changed.
+    """
+    logger.info(f"Prefetching the details and hints of {len(_chals)} challenge(s)")
+    result = prefetch(ctfd, _chals, snapshot, force=force)
+    logger.info(f"{result['fetched']} fetched, {result['cached']} up to date, {len(result['changed'])} changed" + (f", {result['failed']} failed" if result["failed"] else ""))
+
+    if result["changed"] and (count := refresh_readmes(result["changed"], chals_folder)):
+        logger.info(f"Updated the README.md of {count} downloaded challenge(s)")
+
+def sync_new_challenges(ctfd: CTFd_Handler, _config: str) -> list:
+    """
+    Refetches the challenges and writes them to the configuration file, keeping the download state
+    of the challenges already known.
+
+    Returns:
+        The challenges that weren't in the configuration file before
+    """
+    known = {chal["id"]: chal for chal in get_config(_config).get("Challenges", [])}
+
+    _chals = []
+    for challenge in ctfd.get_challenges():
+        chal = ChallengeModel.from_api(challenge)
+        chal.is_downloaded = known.get(chal.id, {}).get("is_downloaded", False)
+        _chals.append(chal)
+
+    write_config("Challenges", [chal.to_dict() for chal in _chals], _config, mode="a")
+    return [chal for chal in _chals if chal.id not in known]
+
+def _get_path() -> str:
+    if not (workspace := Workspace.resolve()):
+        return None
+    return workspace.config
 
 def get_challenges(attr: str = "name"):
 
@@ -89,9 +343,15 @@ def get_container_challenges(attr: str = "name"):
 
 def main():
     parser = argparse.ArgumentParser(description='CTFd CLI for CTF Players to automate their workflows.')
-    parser.add_argument('--config-dir', '-c', type=str, help='The directory where the configuration will be stored', default='.ctfd', dest='config_dir')
+    parser.add_argument('--config-dir', '-c', type=str, help='The directory where the configuration will be stored (Default: nearest .ctfd found walking up from the current directory)', default=None, dest='config_dir')
     parser.add_argument('--dir-name', '-d', type=str, help='Name of the folder', default="challenges", dest='chals_folder')
     parser.add_argument('--skip', '-s', action='store_true', help='Skip checking connection to CTFd instance', default=False, dest='skip')
+    parser.add_argument('--target', '-T', type=str, action='append', help='Run against the given target (can be repeated). Supported by sync and scoreboard', default=[], dest='targets')
+    parser.add_argument('--mirror', '-m', type=str, help='URL of a team mirror (`ctfd serve`) to fetch challenges and files from before CTFd (Default: $CTFD_MIRROR)', default=os.getenv("CTFD_MIRROR"), dest='mirror')
+    parser.add_argument('--mirror-key', type=str, help='Key of the team mirror, or the key to require with `ctfd serve` (Default: $CTFD_MIRROR_KEY)', default=os.getenv("CTFD_MIRROR_KEY"), dest='mirror_key')
+    parser.add_argument('--transport', type=str, help='Transport used for all the requests, http2 needs httpx[http2] (Default: TRANSPORT in the config or requests). Saved as the default of the workspace by init', default=None, choices=["requests", "http2"])
+    parser.add_argument('--offline', '-o', action='store_true', help='Serve reads from the last local snapshot and queue submissions', default=False, dest='offline')
+    parser.add_argument('--all-targets', '-A', action='store_true', help='Run against all the targets configured in the workspace. Supported by sync and scoreboard', default=False, dest='all_targets')
 
     # Default args
     subparsers = parser.add_subparsers(title='Mode to operate the CLI in', dest='mode')
@@ -102,29 +362,55 @@ def main():
     setup_parser.add_argument('--no-token', '-n', action='store_true', help='Do not prompt user for token', default=False)
     setup_parser.add_argument('--url', '-u', type=str, help='CTFd instance URL', default=None)
     setup_parser.add_argument('--force', '-f', action='store_true',help='Overwrite config file if it already exists', default=False)
+    setup_parser.add_argument('--flag-format', type=str, help='Regex every flag of the CTF must match (e.g. "flag\\{[^}]+\\}")', default=None, dest='flag_format')
+    setup_parser.add_argument('--store-flags', action='store_true', help='Store the submitted flags in plaintext in the submission history', default=False, dest='store_flags')
+    setup_parser.add_argument('--flag-prefix', type=str, help='Prefix every flag of the CTF starts with (e.g. "flag{")', default=None, dest='flag_prefix')
 
     # Subparser for generating a token:
     generator_parser = subparsers.add_parser('generate-token', help="Generate a token by logging in as the user")
     generator_parser.add_argument('--url', '-u', type=str, help='CTFd instance URL', default=None)
-    generator_parser.add_argument('--name', '-n', type=str, help='Username or email for login', required=True)
+    generator_parser.add_argument('--name', '-n', type=str, help='Username or email for login (not needed if the previous session is still valid)', default=None)
     generator_parser.add_argument('--password', '-p', type=str, help='Password for CTFd user')
-    generator_parser.add_argument('--force', '-f', action='store_true',help='Overwrite token if already exists in the config file.', default=False)
+    generator_parser.add_argument('--force', '-f', action='store_true',help='Overwrite token even if the existing one is still valid.', default=False)
+
+    # Subparser for the flag format
+    format_parser = subparsers.add_parser('flag-format', help="Show or set the flag format used to check flags before submission")
+    format_parser.add_argument('--regex', '-r', type=str, help='Regex every flag of the CTF must match', default=None)
+    format_parser.add_argument('--prefix', '-p', type=str, help='Prefix every flag of the CTF starts with', default=None)
+    format_parser.add_argument('--clear', action='store_true', help='Remove the flag format', default=False)
+
+    # Subparser for managing additional CTFd instances
+    target_parser = subparsers.add_parser('target', help="Manage additional CTFd instances (targets) in the workspace")
+    target_parser.add_argument('target_mode', type=str, help="Add, remove or list the targets", choices=["add", "remove", "list"])
+    target_parser.add_argument('label', type=str, help="Label of the target", nargs='?', default=None)
+    target_parser.add_argument('--url', '-u', type=str, help='CTFd instance URL', default=None)
+    target_parser.add_argument('--token', '-t', type=str, help='CTFd Token', default=None)
 
     # Subparser for sync
     sync_parser = subparsers.add_parser('sync', help="Sync the challenges with the CTFd instance")
     sync_parser.add_argument('--force', '-f', action='store_true',help='Overwrite challenges if already exists in the config file.', default=False)
+    sync_parser.add_argument('--no-prefetch', action='store_true', help="Don't prefetch the details and hints of the challenges", default=False, dest='no_prefetch')
 
     # Subparser to download all the challenges
     challs_parser = subparsers.add_parser('challenges', help="Download challenges currently in CTFd")
     challs_parser.add_argument('--category', '-c', type=str, help="Download challenges of a specific category", default=None, choices=get_challenges("category"))
     challs_parser.add_argument('--name', '-n', type=str, help="Download a specific challenge", default=None, choices=get_challenges("name"))
     challs_parser.add_argument('--force', '-f', action='store_true',help='Overwrite challenges download files if already downloaded', default=False)
+    challs_parser.add_argument('--segments', type=int, help='Number of parallel connections used for large files (Default: 4)', default=4)
+    challs_parser.add_argument('--segment-threshold', type=int, help='Size in MiB from which files are downloaded over several connections (Default: 64)', default=64, dest='segment_threshold')
+    challs_parser.add_argument('--order', type=str, help='Order the challenges are downloaded in (Default: smallest first)', default="smallest", choices=ORDERS)
+    challs_parser.add_argument('--limit-rate', type=str, help='Cap the combined download rate, in bytes per second (e.g. 500K, 2M)', default=None, dest='limit_rate', metavar='RATE')
+    challs_parser.add_argument('--dry-run', action='store_true', help="Only show what would be downloaded and its size", default=False, dest='dry_run')
 
     # Subparser for flag submission
     submit_parser = subparsers.add_parser('submit', help="Submit flags for the challenges in CTFd")
     submit_parser.add_argument('--challenge-id', '-i', type=int, help="Challenge ID", default=None, dest='chal_id', choices=get_challenges("id"))
     submit_parser.add_argument('--challenge-name', '-n', type=str, help="Challenge Name (We'll fetch the challenge-id for you)", default=None, dest='chal_name', choices=get_challenges("name"))
     submit_parser.add_argument('--flag', '-f', type=str, help="The flag that you want to submit for the challenge.", default=None)
+    submit_parser.add_argument('--candidates', '-C', type=str, help="File with one candidate flag per line (- for stdin), filtered locally before submission", default=None)
+    submit_parser.add_argument('--dry-run', action='store_true', help="Only print the candidates that would be submitted", default=False, dest='dry_run')
+    submit_parser.add_argument('--no-check', action='store_true', help="Skip checking the flag format and previous attempts", default=False, dest='no_check')
+    submit_parser.add_argument('--store-flag', action='store_true', help="Store the flag in plaintext in the submission history (only its hash is stored otherwise)", default=False, dest='store_flag')
 
     # Subparser for instancer
     instance_parser = subparsers.add_parser('instance', help="Start an instance for a specific challenge in CTFd")
@@ -135,6 +421,52 @@ def main():
     # Subparser for scoreboard:
     scoreboard_parser = subparsers.add_parser('scoreboard', help="Get the scoreboard for the CTFd instance")
     scoreboard_parser.add_argument('-n', '--number', type=int, help="Number of top teams to display", default=10)
+    scoreboard_parser.add_argument('-w', '--watch', type=int, help="Refresh the scoreboard every N seconds", default=0, metavar='SECONDS')
+    scoreboard_parser.add_argument('--record', action='store_true', help="Record the whole scoreboard every --watch seconds (Default: 60) into .ctfd/scoreboard.series", default=False)
+    scoreboard_parser.add_argument('--trajectory', type=str, help="Show the recorded score and rank of a team (name or account id)", default=None, metavar='TEAM')
+    scoreboard_parser.add_argument('--movers', action='store_true', help="Show the recorded rank changes of the teams", default=False)
+    scoreboard_parser.add_argument('--window', type=int, help="Only look at the last N minutes of the recording for --trajectory and --movers (Default: all)", default=0, metavar='MINUTES')
+
+    # Subparser for challenge details
+    info_parser = subparsers.add_parser('info', help="Show the details of a specific challenge")
+    info_parser.add_argument('--challenge-id', '-i', type=int, help="Challenge ID", default=None, dest='chal_id', choices=get_challenges("id"))
+    info_parser.add_argument('--challenge-name', '-n', type=str, help="Challenge Name (We'll fetch the challenge-id for you)", default=None, dest='chal_name', choices=get_challenges("name"))
+
+    # Subparser for the flags queued while offline
+    outbox_parser = subparsers.add_parser('outbox', help="List, flush or clear the flags queued while offline")
+    outbox_parser.add_argument('outbox_mode', type=str, help="List, flush or clear the queued flags", choices=["list", "flush", "clear"], nargs='?', default="list")
+
+    # Subparser for notifications
+    notifications_parser = subparsers.add_parser('notifications', help="Show the notifications posted on the CTFd instance")
+    notifications_parser.add_argument('--follow', '-F', action='store_true', help="Keep listening for new notifications using the /events stream", default=False)
+    notifications_parser.add_argument('--sync', action='store_true', help="Sync the challenges whenever an event is received (with --follow)", default=False)
+    notifications_parser.add_argument('--download', action='store_true', help="Also download the new challenges found by --sync", default=False)
+
+    # Subparser for searching the downloaded challenges
+    search_parser = subparsers.add_parser('search', help="Search the downloaded challenges (name, category, description, tags, hints and files)")
+    search_parser.add_argument('query', type=str, help="The words to search for", nargs='*')
+    search_parser.add_argument('-n', '--number', type=int, help="Number of results to display", default=10)
+    search_parser.add_argument('--archive', '-a', type=str, action='append', help="Also search every workspace found under this folder (can be repeated)", default=[])
+    search_parser.add_argument('--rebuild', action='store_true', help="Rebuild the index of the workspace from the downloaded challenges", default=False)
+
+    # Subparser for the submission history
+    history_parser = subparsers.add_parser('history', help="Show the flags submitted from this workspace")
+    history_parser.add_argument('--challenge-id', '-i', type=int, help="Challenge ID", default=None, dest='chal_id', choices=get_challenges("id"))
+    history_parser.add_argument('--challenge-name', '-c', type=str, help="Challenge Name (We'll fetch the challenge-id for you)", default=None, dest='chal_name', choices=get_challenges("name"))
+    history_parser.add_argument('--status', '-s', type=str, help="Only show the submissions with this status", default=None, choices=["correct", "incorrect", "already_solved", "paused", "ratelimited"])
+    history_parser.add_argument('-n', '--number', type=int, help="Number of submissions to display (latest first)", default=20)
+
+    # Subparser for sharing the synced challenges with the team
+    serve_parser = subparsers.add_parser('serve', help="Share the synced challenges and downloaded files with the team (use with --mirror)")
+    serve_parser.add_argument('--host', type=str, help="Address to listen on, use 0.0.0.0 to share with the team (Default: 127.0.0.1)", default="127.0.0.1")
+    serve_parser.add_argument('--port', '-p', type=int, help="Port to listen on", default=8000)
+
+    # Subparsers for archiving the workspace
+    export_parser = subparsers.add_parser('export', help="Export the whole workspace (config, state and challenges) into a single compressed archive")
+    export_parser.add_argument('archive', type=str, help="Path of the archive, compression is picked from the extension (.tar.gz, .tar.xz, .tar.bz2)")
+    import_parser = subparsers.add_parser('import', help="Restore a workspace exported using `ctfd export`, files already present are skipped")
+    import_parser.add_argument('archive', type=str, help="Path of the archive")
+    import_parser.add_argument('--overwrite-config', action='store_true', help="Replace the existing configuration file (and its token) with the one from the archive", default=False)
 
     # Solves subparser
     solves_parser = subparsers.add_parser('solves', help="Get the solves of a specific challenge")
@@ -144,24 +476,45 @@ def main():
     argcomplete.autocomplete(parser)
     args = parser.parse_args()
 
-    # default config
-    chals_folder = args.chals_folder
-    args.config_dir = os.path.abspath(os.path.join(chals_folder, args.config_dir))
+    # An explicit --config-dir always wins, otherwise we look for the nearest workspace.
+    # `init` and `import` never walk up, they create the workspace in the current directory.
+    workspace = None
+    if args.config_dir:
+        workspace = Workspace.from_config_dir(os.path.join(args.chals_folder, args.config_dir))
+    elif args.mode not in ("init", "import"):
+        workspace = Workspace.resolve(dir_name=args.chals_folder)
 
-    if os.path.exists("/tmp/.ctfd.cache"):
-        logger.warning("Using the cached configuration file path.")
+    if not workspace:
+        workspace = Workspace.from_config_dir(os.path.join(args.chals_folder, ".ctfd"))
 
-    # store the updated config file path in /tmp/.ctfd.cache
-    if not os.path.exists("/tmp/.ctfd.cache"):
-        with open("/tmp/.ctfd.cache", "w") as fp:
-            fp.write(f"{args.config_dir}")
-    else:
-        with open("/tmp/.ctfd.cache") as fp:
-            args.config_dir = fp.read().strip()
+    args.config_dir = workspace.config_dir
+    _config = workspace.config
+    args.chals_folder = chals_folder = workspace.root
+
+    if args.offline and args.mode not in ("submit", "scoreboard", "solves", "info", "outbox", "search", "history", "serve"):
+        logger.error(f"`{args.mode}` can't be used with --offline.")
+        exit(1)
+
+    RequestHandler.set_transport(args.transport or get_config(_config).get("CTFD", {}).get("TRANSPORT"))
 
-    _config = os.path.join(args.config_dir, "config.json")
-    # Bad coding. Don't do it like this. but works.
-    args.chals_folder = chals_folder = os.path.abspath(os.path.join(args.config_dir, os.pardir))
+    def refresh_token(token: str) -> str:
+        # Only the token of the configured instance is refreshed, using the persisted login session.
+        _ctfd = get_config(_config).get("CTFD", {})
+        if not _ctfd.get("URL") or token != _ctfd.get("TOKEN"):
+            return token
+
+        generator = GenerateToken(_ctfd["URL"], cookie_jar=workspace.state_path("session.json", per_user=True))
+        if (new := generator.refresh(token)) != token:
+            write_config("CTFD", {**_ctfd, "TOKEN": new}, _config, mode="a")
+            logger.info(f"Successfully generated token and written to {_config}")
+        return new
+
+    RequestHandler.set_token_refresh(refresh_token)
+
+    snapshot = Snapshot(workspace.state_path("snapshot.json"))
+    outbox = Outbox(workspace.state_path("outbox.jsonl"))
+    ledger = Ledger(workspace.state_path("ledger.jsonl"))
+    index = SearchIndex(workspace.state_path("index.json"))
 
     if args.mode == "init":
 
@@ -179,7 +532,17 @@ def main():
         else:
             os.makedirs(args.config_dir, exist_ok=True) # create the .config folder.
             
-        write_config("CTFD", {"URL": args.url, "TOKEN": args.token}, _config)
+        _ctfd = {"URL": args.url, "TOKEN": args.token}
+        if args.flag_format:
+            _ctfd["FLAG_FORMAT"] = args.flag_format
+        if args.flag_prefix:
+            _ctfd["FLAG_PREFIX"] = args.flag_prefix
+        if args.store_flags:
+            _ctfd["STORE_FLAGS"] = True
+        if args.transport:
+            _ctfd["TRANSPORT"] = args.transport
+
+        write_config("CTFD", _ctfd, _config)
         logger.info(f"Successfully wrote configurations to: {_config}")
 
     elif args.mode == "generate-token":
@@ -192,16 +555,81 @@ def main():
         """
         do_checks(args, _config)
 
+        generator = GenerateToken(args.url, args.name, args.password, cookie_jar=workspace.state_path("session.json", per_user=True))
+
         if args.token and not args.force:
-            logger.error("Token already exists in the configuration file. Please specify --force to overwrite it.")
-            exit(1)
+            if generator.is_token_valid(args.token):
+                logger.info("Token in the configuration file is still valid. Please specify --force to generate a new one.")
+                exit(0)
+            logger.warning("Token in the configuration file is no longer valid, generating a new one.")
 
-        generator = GenerateToken(args.url, args.name, args.password)
         args.token = generator.generate_token()
 
-        write_config("CTFD", {"URL": args.url, "TOKEN": args.token}, _config)
+        write_config("CTFD", {**config["CTFD"], "URL": args.url, "TOKEN": args.token}, _config, mode="a")
         logger.info(f"Successfully generated token and written to {_config}")
 
+    elif args.mode == "flag-format":
+        do_checks(args, _config)
+        _ctfd = config["CTFD"]
+
+        if args.clear:
+            _ctfd.pop("FLAG_FORMAT", None)
+            _ctfd.pop("FLAG_PREFIX", None)
+
+        if args.regex:
+            try:
+                re.compile(args.regex)
+            except re.error as E:
+                logger.error(f"Invalid regex: {E}")
+                exit(1)
+            _ctfd["FLAG_FORMAT"] = args.regex
+
+        if args.prefix:
+            _ctfd["FLAG_PREFIX"] = args.prefix
+
+        if args.clear or args.regex or args.prefix:
+            write_config("CTFD", _ctfd, _config, mode="a")
+
+        logger.info(f"Flag format: {_ctfd.get('FLAG_FORMAT', 'Not set')}, Flag prefix: {_ctfd.get('FLAG_PREFIX', 'Not set')}")
+
+    elif args.mode == "target":
+        # do_checks overrides url/token with the ones of the default instance.
+        url, token = args.url, args.token
+        do_checks(args, _config)
+        args.url, args.token = url, token
+        targets = config.get("Targets", {})
+
+        if args.target_mode == "list":
+            table = [[label, target.get("URL", ""), "Yes" if target.get("TOKEN") else "No", len(target.get("Challenges", []))] for label, target in get_targets(config).items()]
+            print(tabulate.tabulate(table, ["Target", "URL", "Token", "Challenges"], tablefmt="fancy_outline"))
+            exit(0)
+
+        if not args.label:
+            logger.error("Please specify the label of the target.")
+            exit(1)
+
+        if args.label == DEFAULT_TARGET:
+            logger.error(f"\"{DEFAULT_TARGET}\" is reserved for the instance configured using `ctfd init`.")
+            exit(1)
+
+        if args.target_mode == "add":
+            if not args.url:
+                args.url = input("Enter the CTFd URL: ")
+            if not args.token:
+                args.token = input("Enter the CTFd token: ")
+
+            targets[args.label] = {"URL": args.url, "TOKEN": args.token}
+            write_config("Targets", targets, _config, mode="a")
+            logger.info(f"Successfully added target {args.label}")
+
+        elif args.target_mode == "remove":
+            if not targets.pop(args.label, None):
+                logger.error(f"No target found with label {args.label}")
+                exit(1)
+
+            write_config("Targets", targets, _config, mode="a")
+            logger.info(f"Successfully removed target {args.label}")
+
     elif args.mode == "sync":
 
         """
@@ -209,24 +637,51 @@ def main():
         """
         do_checks(args, _config, check_token=True)
 
+        if targets := get_selected_targets(args):
+            # Challenges of the default target are stored as before, the other targets keep their own list.
+            if not args.force:
+                for label in [label for label, target in targets.items() if (config if label == DEFAULT_TARGET else target).get("Challenges")]:
+                    logger.warning(f"[{label}] Challenges already exist in the configuration file. Please specify --force to refetch and update it.")
+                    targets.pop(label)
+
+            logger.info(f"Fetching all the challenges deployed on {', '.join(targets)}")
+            for label, challenges in MultiCTFd_Handler(targets, args.skip).run("get_challenges").items():
+                if challenges is None:
+                    continue
+
+                _chals = [ChallengeModel.from_api(challenge).to_dict() for challenge in challenges]
+                logger.info(f"[{label}] Found {len(_chals)} challenges")
+
+                if label == DEFAULT_TARGET:
+                    check_downloaded_challenges(_chals, chals_folder, snapshot)
+                    write_config("Challenges", _chals, _config, mode="a")
+                    if not args.no_prefetch:
+                        prefetch_challenges(CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key), _chals, snapshot, chals_folder, args.force)
+                else:
+                    update_target(_config, label, "Challenges", _chals)
+            exit(0)
+
         if config.get("Challenges", "") and not args.force:
             logger.error("Challenges already exist in the configuration file. Please specify --force to refetch and update it.")
             exit(1)
 
-        ctfd = CTFd_Handler(args.url, args.token, args.skip)
+        ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key)
         logger.info("Fetching all the challenges deployed on CTFd")
         challenges = ctfd.get_challenges()
         
         _chals = []
         for challenge in challenges:
-            chal = ChallengeModel(**challenge)
+            chal = ChallengeModel.from_api(challenge)
             logger.info(f"Found {chal} of category {chal.category}")
-            _chals.append(chal.__dict__())
+            _chals.append(chal.to_dict())
         
-        check_downloaded_challenges(_chals, chals_folder)
+        check_downloaded_challenges(_chals, chals_folder, snapshot)
 
         write_config("Challenges", _chals, _config, mode="a")
 
+        if not args.no_prefetch:
+            prefetch_challenges(ctfd, _chals, snapshot, chals_folder, args.force)
+
     elif args.mode == "challenges":
         """
         Idea for future reference:
@@ -259,167 +714,168 @@ def main():
             logger.error("No challenges found. Please run `ctfd sync` to fetch the challenges from CTFd.")
             exit(1)
 
-        ctfd = CTFd_Handler(args.url, args.token, args.skip)
+        limiter = None
+        if args.limit_rate:
+            try:
+                if (rate := parse_size(args.limit_rate)) <= 0:
+                    raise ValueError
+                limiter = RateLimiter(rate)
+            except ValueError:
+                logger.error(f"Invalid rate {args.limit_rate}, use bytes per second such as 500K or 2M.")
+                exit(1)
 
-        for challenge in challenges:
-            chal = ChallengeModel(**challenge)
+        ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key, segments=args.segments, segment_threshold=args.segment_threshold * 1024 * 1024, limiter=limiter)
 
-            if chal.is_downloaded and not args.force:
-                logger.warning(f"Challenge {chal.name} is already downloaded, use --force to redownload.")
-                continue
+        # The folder is the source of truth, `is_downloaded` may be stale (deleted folders, interrupted downloads)
+        states = scan_downloads(challenges, chals_folder, snapshot)
 
-            logger.warning(f"Redownloading {chal.name}") if args.force else logger.info(f"Downloading {chal}")
-            _chal = ctfd.get_challenge(chal.id)
-
-            if not _chal:
-                logger.error(f"Could not download {_chal}")
+        pending = []
+        for challenge in challenges:
+            if states.get(challenge["id"]) == DOWNLOADED and not args.force:
+                logger.warning(f"Challenge {challenge['name']} is already downloaded, use --force to redownload.")
                 continue
 
-            category_folder = os.path.join(chals_folder, _chal["category"])
-            os.makedirs(category_folder, exist_ok=True)
-
-            chal_folder = os.path.join(category_folder, _chal['name'].replace(" ", "-"))
-            os.makedirs(chal_folder, exist_ok=True)
-            chal_info = os.path.join(chal_folder, "README.md")
-
-            _files = []
-            if files := _chal.get("files", []):
-                for file in files:
-                    filename = os.path.basename(file).split("?")[0]
-                    logger.info(f"Downloading challenge file: {filename} for {_chal['name']}")
-
-                    file_path = os.path.join(chal_folder, filename)
-                    ctfd.download_file(file, file_path)
-                    _files.append(file_path)
-
-            with open(chal_info, "w") as fp:
-                fp.write(f"# {_chal['name']}\n\n")
-                fp.write(f"**Category**: {_chal.get('category', '')}\n")
-                fp.write(f"**Points**: {_chal.get('value', '')}\n")
-                fp.write(f"**Description**:\n```md\n{_chal.get('description', '')}\n```\n")
-                if _files:
-                    fp.write(f"**Files**:\n")
-                    for file in _files:
-                        fp.write(f"- [{os.path.basename(file)}]({file})\n")
-            
-            update_challenge(_config, chal.id, "is_downloaded", True)
-            logger.info(f"Successfully downloaded {chal.name}")
-
-            submit_sh_template = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates/submit.sh")
-
-            update_template(submit_sh_template, os.path.join(chal_folder, "submit.sh"), chal.id, args.config_dir)
-
-            if chal.type == "container":
-                launch_sh_template = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates/launch.sh")
-                update_template(launch_sh_template, os.path.join(chal_folder, "launch.sh"), chal.id, args.config_dir)
-
-            logger.info(f"Successfully copied submit.sh {'and launch.sh' if chal.type == 'container' else ''} to {chal_folder}")
+            if states.get(challenge["id"]) == PARTIAL and not args.force:
+                logger.warning(f"Challenge {challenge['name']} is only partially downloaded, downloading it again.")
+            pending.append(challenge)
+
+        # Plan the downloads: the details are fetched again (concurrently) since the file links they hold
+        # expire, then the sizes of the attachments are known from HEAD requests.
+        fetched = {"changed": {}, "failed": 0}
+        if pending:
+            logger.info(f"Fetching the details of {len(pending)} challenge(s)")
+            fetched = prefetch(ctfd, pending, snapshot, force=True)
+            if fetched["failed"]:
+                logger.warning(f"Could not fetch the details of {fetched['failed']} challenge(s), they'll be fetched again when downloaded.")
+        details = {chal["id"]: fetched["changed"].get(chal["id"], {}) for chal in pending}
+        sizes = estimate_sizes(ctfd, [file for _chal in details.values() for file in _chal.get("files", [])])
+        plan = plan_downloads(pending, details, sizes, args.order)
+
+        total, unknown = sum(entry.size for entry in plan), sum(entry.unknown for entry in plan)
+        if plan:
+            logger.info(f"{len(plan)} challenge(s) to download, {human_size(total)} in total" + (f" ({unknown} file(s) of unknown size)" if unknown else ""))
+
+        if args.dry_run:
+            table, done = [], 0
+            for entry in plan:
+                done += entry.size
+                table.append([entry.challenge["name"], entry.challenge.get("category", ""), len(entry.files), human_size(entry.size) + ("+?" if entry.unknown else ""), human_size(done)])
+            print(tabulate.tabulate(table, ["Challenge", "Category", "Files", "Size", "Cumulative"], tablefmt="fancy_outline"))
+            exit(0)
 
+        # The snapshot and the index are written entirely every time, they're saved once every SAVE_EVERY
+        # challenges (and when stopping) rather than after every challenge.
+        failed, downloads = [], {}
+
+        def save_downloads() -> None:
+            if downloads:
+                snapshot.put_many("downloads", downloads)
+                index.save()
+                downloads.clear()
+
+        try:
+            for entry in plan:
+                chal = ChallengeModel(**entry.challenge)
+                logger.warning(f"Redownloading {chal.name}") if args.force else logger.info(f"Downloading {chal}")
+                try:
+                    # Only the challenges whose details couldn't be fetched above are fetched again
+                    downloaded = download_challenge(ctfd, chal, chals_folder, args.config_dir, snapshot, index, refresh=not details[chal.id], downloads=downloads)
+                except Exception as E:
+                    logger.error(f"Could not download {chal}: {E.__str__()}")
+                    downloaded = False
+
+                if not downloaded:
+                    failed.append(chal.name)
+                elif len(downloads) >= SAVE_EVERY:
+                    save_downloads()
+        finally:
+            save_downloads()
+
+        if failed:
+            logger.error(f"{len(failed)} challenge(s) could not be downloaded: {', '.join(failed)}. Run `ctfd challenges` again to retry them.")
+            exit(1)
         logger.info("All challenges downloaded successfully.")
 
     elif args.mode == "submit":
         do_checks(args, _config, check_token=True)
 
-        if not args.chal_id and not args.chal_name:
-            logger.error("Please specify either challenge ID or challenge Name")
-            exit(1)
+        chal = find_challenge(args)
 
-        if not args.flag:
+        if not args.flag and not args.candidates:
             args.flag = input("Enter the flag: ")
 
             if not args.flag:
                 logger.error("No flag provided. Please specify the flag.")
                 exit(1)
 
-        if args.chal_name:
-            challenges = config["Challenges"]
-            chal = None
-            for challenge in challenges:
-                if challenge["name"] == args.chal_name:
-                    chal = ChallengeModel(**challenge)
-                    break
+        flag_filter = FlagFilter.from_config(config, ledger)
+        ledger.store_flags = config["CTFD"].get("STORE_FLAGS", False) or args.store_flag
+
+        if args.candidates:
+            with (sys.stdin if args.candidates == "-" else open(args.candidates)) as fp:
+                flags, stats = flag_filter.filter(chal.id, fp)
 
-            if not chal:
-                logger.error(f"No challenge found for name {args.chal_name}")
+            logger.info(f"{len(flags)}/{stats['total']} candidate(s) left after dropping {stats['malformed']} malformed, {stats['attempted']} already submitted, {stats['duplicate']} duplicate and {stats['empty']} empty")
+            if args.dry_run:
+                print("\n".join(flags))
+                exit(0)
+
+            if not flags:
+                logger.error("No candidates left to submit.")
                 exit(1)
+        else:
+            if not args.no_check and (reason := flag_filter.check(chal.id, args.flag)):
+                logger.error(f"Flag {reason}. Use --no-check to submit it anyway.")
+                exit(1)
+            flags = [args.flag]
 
-            args.chal_id = chal.id
+        if args.offline:
+            for flag in flags:
+                outbox.push(chal.id, flag)
+            logger.info(f"Queued {len(flags)} flag(s) for {chal}, they'll be submitted once you're back online.")
+            exit(0)
 
-        if args.chal_id:
-            challenges = config["Challenges"]
-            chal = None
-            for challenge in challenges:
-                if challenge["id"] == args.chal_id:
-                    chal = ChallengeModel(**challenge)
-                    break
+        ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key)
+        flush_outbox(ctfd, outbox, ledger)
+        logger.info(f"Submitting {len(flags)} flag(s) for {chal}" if len(flags) > 1 else f"Submitting flag for {chal}")
 
-            if not chal:
-                logger.error(f"No challenge found for ID {args.chal_id}")
-                exit(1)
+        for flag in flags:
+            resp = SubmissionModel.from_api(submit_and_record(ctfd, ledger, chal.id, flag))
 
-        ctfd = CTFd_Handler(args.url, args.token, args.skip)
-        logger.info(f"Submitting flag for {chal}")
+            if resp.status != "incorrect":
+                break
+            logger.error(f"Incorrect Flag: {flag}" if len(flags) > 1 else "Incorrect Flag. Try again.")
 
-        resp = ctfd.submit_flag(chal.id, args.flag)
-        if resp["status"] == "incorrect":
-            logger.error("Incorrect Flag. Try again.")
+        if resp.status == "incorrect":
             exit(1)
 
-        elif resp["status"] == "correct":
+        elif resp.status == "correct":
             logger.info("🎉🎉🎉 Flag submitted successfully 🎉🎉🎉")
 
             if chal.type == "container":
                 logger.info("Stopping instance for the challenge.")
                 if resp := ctfd.stop_instance(chal.id):
-                    if _err := resp.get('error', ''):
+                    if _err := InstanceModel.from_api(resp).error:
                         logger.error(f"Error: {_err}")
                         exit(1)
                     logger.info("Instance stopped successfully.")
 
-        elif resp["status"] == "already_solved":
+        elif resp.status == "already_solved":
             logger.warning("🔒🔒🔒 Challenge already solved by your team 🔒🔒🔒")
 
         else:
-            logger.error(f"Flag submission failed. Reason: {resp['message']}")
+            logger.error(f"Flag submission failed. Reason: {resp.message}")
 
     elif args.mode == "instance":
         do_checks(args, _config, check_token=True)
         
-        if not args.chal_id and not args.chal_name:
-            logger.error("Please specify either challenge ID or challenge Name")
-            exit(1)
-
-        if args.chal_name:
-            challenges = config["Challenges"]
-            chal = None
-            for challenge in challenges:
-                if challenge["name"] == args.chal_name:
-                    chal = ChallengeModel(**challenge)
-                    break
-
-            if not chal:
-                logger.error(f"No challenge found for name {args.chal_name}")
-                exit(1)
-
-            args.chal_id = chal.id
-
-        if args.chal_id:
-            challenges = config["Challenges"]
-            chal = None
-            for challenge in challenges:
-                if challenge["id"] == args.chal_id:
-                    chal = ChallengeModel(**challenge)
-                    break
-
-            if not chal:
-                logger.error(f"No challenge found for ID {args.chal_id}")
-                exit(1)
+        chal = find_challenge(args)
 
         if chal.type != "container":
             logger.error(f"Challenge {chal.name} is not a container challenge.")
             exit(1)
         
-        ctfd = CTFd_Handler(args.url, args.token, args.skip)
+        ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key)
 
         if args.instance_mode == "start":
 
@@ -429,17 +885,17 @@ def main():
                 logger.error(f"Failed to start instance for {chal.name}")
                 exit(1)
 
-            if _err := resp.get('error', ''):
+            resp = InstanceModel.from_api(resp)
+            if _err := resp.error:
                 logger.error(f"Error: {_err}")
                 if "Please stop" in _err:
                     logger.error("Use `ctfd instance stop` command to stop the instance.")
                 exit(1)
 
-            if resp["status"] == "already_running":
+            if resp.status == "already_running":
                 logger.warning("Instance already running for this challenge.")
 
-            _i = f"http://{resp['hostname']}:{resp['port']}" if resp['connect'] == "http" else f"nc {resp['hostname']} {resp['port']}"
-            logger.info(f"Connect: \033[91m\033[4m\033[1m{_i}\033[0m")
+            logger.info(f"Connect: \033[91m\033[4m\033[1m{resp.connection_string}\033[0m")
 
         elif args.instance_mode == "extend":
             logger.info(f"Extending instance time for {chal}")
@@ -448,13 +904,13 @@ def main():
                 logger.error(f"Failed to extend instance for {chal.name}")
                 exit(1)
 
-            if _err := resp.get('error', ''):
+            resp = InstanceModel.from_api(resp)
+            if _err := resp.error:
                 logger.error(f"Error: {_err}")
                 exit(1)
 
             logger.info("Instance extended successfully.")
-            _i = f"http://{resp['hostname']}:{resp['port']}" if resp['connect'] == "http" else f"nc {resp['hostname']} {resp['port']}"
-            logger.info(f"Connect: \033[91m\033[4m\033[1m{_i}\033[0m")
+            logger.info(f"Connect: \033[91m\033[4m\033[1m{resp.connection_string}\033[0m")
 
         elif args.instance_mode == "stop":
             logger.info(f"Stopping instance for {chal}")
@@ -463,75 +919,113 @@ def main():
                 logger.error(f"Failed to stop instance for {chal.name}")
                 exit(1)
 
-            if _err := resp.get('error', ''):
+            resp = InstanceModel.from_api(resp)
+            if _err := resp.error:
                 logger.error(f"Error: {_err}")
                 exit(1)
             
-            if msg := resp.get("success", ""):
+            if resp.success:
                 logger.info("Instance stopped successfully.")
 
     elif args.mode == "scoreboard":
         do_checks(args, _config)
 
-        ctfd = CTFd_Handler(args.url, args.token, args.skip)
-        logger.info(f"Getting scoreboard for the CTFd instance")
-
-        scoreboard = ctfd.get_scoreboard(args.number)
-        if not scoreboard:
-            logger.error("No scoreboard found.")
-            exit(1)
+        targets = get_selected_targets(args) or {DEFAULT_TARGET: {"URL": args.url, "TOKEN": args.token}}
+        if args.record or args.trajectory or args.movers:
+            series = {label: ScoreSeries(workspace.state_path("scoreboard.series" if label == DEFAULT_TARGET else f"scoreboard-{label}.series"), repair=args.record) for label in targets}
+
+        if args.trajectory or args.movers:
+            since = time.time() - args.window * 60 if args.window else None
+            for label, _series in series.items():
+                if not _series.samples:
+                    logger.warning(f"[{label}] Nothing recorded yet, use `ctfd scoreboard --record`.")
+                    continue
+                logger.info(f"[{label}] {_series.samples} samples recorded between {Snapshot.age(_series.first)} and {Snapshot.age(_series.last)}")
+
+                if args.trajectory:
+                    if (team := _series.find(args.trajectory)) is None:
+                        logger.error(f"[{label}] {args.trajectory} was never on the recorded scoreboard.")
+                        continue
+                    table = [[Snapshot.age(when), score, rank] for when, score, rank in _series.trajectory(team, since)]
+                    print(tabulate.tabulate(table, ["Time", "Score", "Rank"], tablefmt="fancy_outline"))
+                else:
+                    table = [[name, before or "-", after, f"{(before - after):+d}" if before else "new", score] for name, before, after, _, score in _series.rank_changes(since)[:args.number]]
+                    print(tabulate.tabulate(table, ["Team", "Was", "Rank", "Change", "Score"], tablefmt="fancy_outline"))
+            exit(0)
 
-        headers = ["Rank", "Team", "Score"]
-        table = []
+        if args.record:
+            if args.offline:
+                logger.error("The scoreboard can't be recorded with --offline.")
+                exit(1)
 
-        for pos, team in scoreboard.items():
-            table.append([pos, team["name"], team["score"]])
+            handler = MultiCTFd_Handler(targets, args.skip)
+            interval = args.watch or 60
+            logger.info(f"Recording the scoreboard of {', '.join(targets)} every {interval} seconds, press Ctrl+C to stop.")
+            try:
+                while True:
+                    for label, standings in handler.run("get_standings").items():
+                        if standings is None:
+                            continue
+                        changed = series[label].record(standings)
+                        logger.info(f"[{label}] {len(standings)} teams, {changed} score change(s)")
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                pass
+            exit(0)
 
-        print(tabulate.tabulate(table[:args.number], headers, tablefmt="fancy_outline"))
+        if args.offline:
+            scoreboards = {}
+            for label in targets:
+                scoreboard, updated = snapshot.get("scoreboard", label)
+                if scoreboard:
+                    logger.info(f"[{label}] Scoreboard from the snapshot taken at {Snapshot.age(updated)}")
+                    scoreboards[label] = scoreboard
 
-    elif args.mode == "solves":
-        do_checks(args, _config)
+            if not scoreboards:
+                logger.error("No scoreboard found in the local snapshot.")
+                exit(1)
 
-        if not args.chal_id and not args.chal_name:
-            logger.error("Please specify either challenge ID or challenge Name")
-            exit(1)
+            print_scoreboard(scoreboards, args.number)
+            exit(0)
 
-        if args.chal_name:
-            challenges = config.get("Challenges", [])
-            if not challenges:
-                logger.error("No challenges found. Please run `ctfd sync` to fetch the challenges from CTFd.")
-                exit(1)
-            chal = None
-            for challenge in challenges:
-                if challenge["name"] == args.chal_name:
-                    chal = ChallengeModel(**challenge)
-                    break
+        handler = MultiCTFd_Handler(targets, args.skip)
+        logger.info(f"Getting scoreboard for {', '.join(targets)}")
 
-            if not chal:
-                logger.error(f"No challenge found for name {args.chal_name}")
-                exit(1)
+        try:
+            while True:
+                scoreboards = {label: scoreboard for label, scoreboard in handler.run("get_scoreboard", args.number).items() if scoreboard}
+                for label, scoreboard in scoreboards.items():
+                    snapshot.put("scoreboard", label, scoreboard)
+                if not scoreboards and not args.watch:
+                    logger.error("No scoreboard found.")
+                    exit(1)
 
-            args.chal_id = chal.id
+                if args.watch:
+                    print("\033[H\033[2J", end="")
+                print_scoreboard(scoreboards, args.number)
 
-        if args.chal_id:
-            challenges = config.get("Challenges", [])
-            if not challenges:
-                logger.error("No challenges found. Please run `ctfd sync` to fetch the challenges from CTFd.")
-                exit(1)
-            chal = None
-            for challenge in challenges:
-                if challenge["id"] == args.chal_id:
-                    chal = ChallengeModel(**challenge)
+                if not args.watch:
                     break
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            pass
 
-            if not chal:
-                logger.error(f"No challenge found for ID {args.chal_id}")
-                exit(1)
+    elif args.mode == "solves":
+        do_checks(args, _config)
+
+        chal = find_challenge(args)
 
-        ctfd = CTFd_Handler(args.url, args.token, args.skip)
-        logger.info(f"Getting solves for {chal}")
+        if args.offline:
+            solves, updated = snapshot.get("solves", chal.id)
+            if solves is not None:
+                logger.info(f"Solves from the snapshot taken at {Snapshot.age(updated)}")
+        else:
+            ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key)
+            logger.info(f"Getting solves for {chal}")
+
+            solves = ctfd.get_solves(chal.id)
+            snapshot.put("solves", chal.id, solves)
 
-        solves = ctfd.get_solves(chal.id)
         if not solves:
             logger.error(f"No solves found for {chal.name}")
             exit(1)
@@ -539,11 +1033,206 @@ def main():
         headers = ["Name", "Date"]
         table = []
 
-        for solve in solves:
-            table.append([solve["name"], solve["date"]])
+        for solve in map(SolveModel.from_api, solves):
+            table.append([solve.name, solve.date])
 
         print(tabulate.tabulate(table, headers, tablefmt="fancy_outline"))
 
+    elif args.mode == "info":
+        do_checks(args, _config, check_challenges=True)
+        chal = find_challenge(args)
+
+        if args.offline:
+            _chal, updated = snapshot.get("challenges", chal.id)
+            if not _chal:
+                logger.error(f"{chal} is not in the local snapshot. Run `ctfd challenges` while online first.")
+                exit(1)
+            logger.info(f"Details from the snapshot taken at {Snapshot.age(updated)}")
+        else:
+            ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key)
+            _chal, updated = ctfd.fetch_challenge(chal.id)
+            if not _chal:
+                logger.error(f"Could not fetch {chal}")
+                exit(1)
+            snapshot.put("challenges", chal.id, _chal, updated)
+
+        print(tabulate.tabulate([
+            ["ID", _chal["id"]],
+            ["Name", _chal["name"]],
+            ["Category", _chal.get("category", "")],
+            ["Points", _chal.get("value", "")],
+            ["Solves", _chal.get("solves", "")],
+            ["Files", "\n".join(os.path.basename(file).split("?")[0] for file in _chal.get("files", []))],
+        ], tablefmt="fancy_outline"))
+        print(_chal.get("description", ""))
+
+    elif args.mode == "notifications":
+        do_checks(args, _config, check_token=True)
+        ctfd = CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key)
+
+        if not args.follow:
+            notifications = ctfd.get_notifications()
+            if not notifications:
+                logger.info("No notifications found.")
+                exit(0)
+
+            table = [[notification["date"], notification["title"], notification["content"]] for notification in notifications]
+            print(tabulate.tabulate(table, ["Date", "Title", "Content"], tablefmt="fancy_outline"))
+            exit(0)
+
+        last_id_path = workspace.state_path("last_event_id")
+        last_id = None
+        if os.path.exists(last_id_path):
+            with open(last_id_path) as fp:
+                last_id = fp.read().strip() or None
+
+        logger.info("Listening for notifications, press Ctrl+C to stop.")
+        try:
+            for event in ctfd.events(last_id):
+                if event.event == "notification":
+                    try:
+                        notification = event.json()
+                        logger.info(f"📢 {notification.get('title', '')}: {notification.get('content', '')}")
+                    except (ValueError, AttributeError):
+                        logger.warning(f"Received a malformed notification: {event.data!r}")
+                else:
+                    logger.info(f"Received {event.event} event")
+
+                if event.id:
+                    with open(last_id_path, "w") as fp:
+                        fp.write(event.id)
+
+                if not args.sync or event.event not in SYNC_EVENTS:
+                    continue
+
+                try:
+                    for chal in sync_new_challenges(ctfd, _config):
+                        logger.info(f"New challenge: {chal} of category {chal.category}")
+                        if args.download:
+                            download_challenge(ctfd, chal, chals_folder, args.config_dir, snapshot, index)
+                            index.save()
+                except Exception as E:
+                    logger.error(f"Could not sync the challenges: {E.__str__()}")
+        except KeyboardInterrupt:
+            pass
+
+    elif args.mode == "search":
+        indexes = [index] if os.path.exists(_config) else []
+
+        if args.rebuild:
+            do_checks(args, _config)
+            rebuild_index(index, snapshot, chals_folder)
+            logger.info(f"Indexed {len(index)} challenge(s)")
+
+        for archive in args.archive:
+            indexes += [SearchIndex(path) for path in find_indexes(archive) if path != index.path]
+
+        if not args.query:
+            if not args.rebuild:
+                logger.error("Please specify what to search for.")
+                exit(1)
+            exit(0)
+
+        if not indexes:
+            logger.error("No index found. Please run `ctfd challenges` (or `ctfd search --rebuild`) first.")
+            exit(1)
+
+        results = []
+        for _index in indexes:
+            results += _index.search(" ".join(args.query), args.number)
+        results.sort(key=lambda result: result[0], reverse=True)
+
+        if not results:
+            logger.info("No challenges found.")
+            exit(0)
+
+        table = [[f"{score:.2f}", meta["name"], meta["category"], os.path.relpath(meta["path"])] for score, meta in results[:args.number]]
+        print(tabulate.tabulate(table, ["Score", "Name", "Category", "Path"], tablefmt="fancy_outline"))
+
+    elif args.mode == "history":
+        do_checks(args, _config)
+
+        chal_id = find_challenge(args).id if args.chal_id or args.chal_name else None
+        records = ledger.query(challenge_id=chal_id, status=args.status, limit=args.number)
+        if not records:
+            logger.info("No submissions found.")
+            exit(0)
+
+        names = {chal["id"]: chal["name"] for chal in config.get("Challenges", [])}
+        table = [[
+            Snapshot.age(record.time),
+            names.get(record.challenge_id, record.challenge_id),
+            record.status,
+            f"{record.latency} ms" if record.latency is not None else "",
+            record.user or "",
+            record.flag or record.hash[:16]
+        ] for record in reversed(records)]
+        print(tabulate.tabulate(table, ["Date", "Challenge", "Status", "Latency", "User", "Flag"], tablefmt="fancy_outline"))
+
+    elif args.mode == "serve":
+        do_checks(args, _config, check_challenges=True)
+
+        # The mirror hands out unlocked hints and signed file links, anything reachable from the LAN needs a key.
+        if not args.mirror_key and args.host not in ("127.0.0.1", "localhost", "::1"):
+            args.mirror_key = secrets.token_urlsafe(24)
+            logger.warning(f"No --mirror-key given, generated one: {args.mirror_key}")
+
+        server = MirrorServer((args.host, args.port), _config, snapshot, chals_folder, key=args.mirror_key)
+        logger.info(f"Serving {len(config['Challenges'])} challenge(s) from {chals_folder} on http://{args.host}:{args.port}")
+        logger.info(f"Teammates can use it with: ctfd --mirror http://<your-ip>:{args.port}" + (f" --mirror-key {args.mirror_key}" if args.mirror_key else "") + " challenges")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+    elif args.mode == "export":
+        do_checks(args, _config)
+
+        logger.info(f"Exporting {chals_folder} to {args.archive}")
+        manifest = export_workspace(chals_folder, args.archive)
+        logger.info(f"Exported {len(manifest['files'])} file(s) to {args.archive}")
+        logger.warning("The archive contains the configuration file, including the CTFd token.")
+
+    elif args.mode == "import":
+        if not os.path.isfile(args.archive):
+            logger.error(f"Archive {args.archive} not found.")
+            exit(1)
+
+        logger.info(f"Importing {args.archive} into {chals_folder}")
+        try:
+            stats = import_workspace(args.archive, chals_folder, overwrite_config=args.overwrite_config)
+        except Exception as E:
+            logger.error(f"Unable to import {args.archive}: {E.__str__()}")
+            exit(1)
+
+        # The index has the absolute paths of the challenges, which may have changed.
+        rebuild_index(SearchIndex(workspace.state_path("index.json")), Snapshot(workspace.state_path("snapshot.json")), chals_folder)
+        logger.info(f"Imported {stats['extracted']} file(s), skipped {stats['skipped']} already present.")
+        if stats["kept"]:
+            logger.warning("Kept the existing configuration file, use --overwrite-config to replace it with the one from the archive.")
+
+    elif args.mode == "outbox":
+        do_checks(args, _config)
+
+        if args.outbox_mode == "list":
+            entries = outbox.entries()
+            if not entries:
+                logger.info("No flags queued.")
+                exit(0)
+
+            table = [[entry["challenge_id"], entry["flag"], Snapshot.age(entry["queued"])] for entry in entries]
+            print(tabulate.tabulate(table, ["Challenge ID", "Flag", "Queued"], tablefmt="fancy_outline"))
+
+        elif args.outbox_mode == "flush":
+            if args.offline:
+                logger.error("Can't flush the queued flags with --offline.")
+                exit(1)
+            flush_outbox(CTFd_Handler(args.url, args.token, args.skip, mirror=args.mirror, mirror_key=args.mirror_key), outbox, ledger)
+
+        elif args.outbox_mode == "clear":
+            outbox.clear()
+            logger.info("Cleared all the queued flags.")
+
     else:
         logger.error("Invalid mode specified.")
         parser.print_help()
\ No newline at end of file
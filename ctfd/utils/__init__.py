@@ -1,11 +1,34 @@
-from .ctfd import CTFd, CTFd_Handler, ChallengeModel
+from .ctfd import CTFd, CTFd_Handler
+from .models import (
+    Model, ChallengeModel, SolveModel,
+    ScoreboardEntryModel, SubmissionModel, InstanceModel
+)
 from .handler import Mode, RequestHandler
+from .transport import Transport, RequestsTransport, HTTP2Transport, get_transport
+from .progress import Progress, human_size
+from .download import RateLimiter, parse_size
+from .events import Event, EventParser, EventStream, SYNC_EVENTS
 from .logger import logger
 from .generate import GenerateToken
+from .workspace import Workspace
+from .offline import Snapshot, Outbox
+from .timeseries import ScoreSeries
+from .downloads import (
+    DOWNLOADED, PARTIAL, challenge_slug, challenge_folder,
+    file_stats, scan_folder, scan_downloads
+)
+from .prefetch import prefetch
+from .planner import ORDERS, PlannedChallenge, estimate_sizes, plan_downloads
+from .mirror import MirrorServer
+from .archive import export_workspace, import_workspace
+from .search import SearchIndex, find_indexes, tokenize
+from .flags import FlagFilter, flag_hash, UNCHECKED
+from .ledger import Ledger, Record
+from .targets import MultiCTFd_Handler, get_targets, DEFAULT_TARGET
 from .utils import (
     random_string, get_env,
     fix_url, get_config, write_config,
-    update_challenge, update_template
+    update_challenge, update_target, update_template
 )
 
 import sys
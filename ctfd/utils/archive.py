@@ -0,0 +1,219 @@
+import io
+import os
+import json
+import time
+import tarfile
+import hashlib
+from .logger import logger
+from .workspace import CONFIG_DIR, CONFIG_FILE
+
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+# Rebuilt on import since it has the absolute paths of the challenges
+SKIP = (os.path.join(".ctfd", "index.json"),)
+
+# Scripts that have the absolute path of the config directory baked in (see `update_template`)
+TEMPLATES = ("submit.sh", "launch.sh")
+
+# Holds the token, an existing one is only replaced when asked to
+CONFIG = os.path.join(CONFIG_DIR, CONFIG_FILE)
+
+def _compression(path: str) -> str:
+    for ext, compression in ((".xz", "xz"), (".bz2", "bz2"), (".gz", "gz"), (".tgz", "gz")):
+        if path.endswith(ext):
+            return compression
+    return "gz"
+
+def _walk(root: str, exclude: str = None) -> list:
+    files = []
+    for current, dirs, names in os.walk(root):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(current, name)
+            if path == exclude or name.endswith(".tmp") or not os.path.isfile(path) or os.path.islink(path):
+                continue
+            if (relpath := os.path.relpath(path, root)) not in SKIP:
+                files.append(relpath)
+    return files
+
+class _HashingReader:
+    """
+    Hashes a file while `tarfile` copies it into the archive, so every file is only read once.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.hash = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.fp.read(size)
+        self.hash.update(chunk)
+        return chunk
+
+def export_workspace(root: str, output: str) -> dict:
+    """
+    Streams the whole workspace (the `.ctfd` folder and every challenge folder) into a single
+    compressed tar archive. Every file is read once, straight from disk into the compressed stream,
+    and hashed on the way. The archive ends with a manifest holding the size and sha256 of every file.
+
+    Args:
+        root: The challenges folder of the workspace
+        output: Path of the archive (compression picked from the extension)
+    Returns:
+        The manifest
+    """
+    files = {}
+    with tarfile.open(output, f"w|{_compression(output)}") as tar:
+        for relpath in _walk(root, exclude=os.path.abspath(output)):
+            path = os.path.join(root, relpath)
+            with open(path, "rb") as fp:
+                # The size is taken from the open file, it's what `tarfile` copies.
+                info = tar.gettarinfo(arcname=f"workspace/{relpath}", fileobj=fp)
+                reader = _HashingReader(fp)
+                tar.addfile(info, reader)
+            files[relpath] = {"size": info.size, "sha256": reader.hash.hexdigest()}
+
+        manifest = {"version": 2, "root": root, "created": time.time(), "files": files}
+        _manifest = json.dumps(manifest, indent=4).encode()
+        info = tarfile.TarInfo(MANIFEST)
+        info.size, info.mtime = len(_manifest), int(manifest["created"])
+        tar.addfile(info, io.BytesIO(_manifest))
+
+    return manifest
+
+def _safe_path(root: str, relpath: str) -> str:
+    path = os.path.abspath(os.path.join(root, relpath))
+    if os.path.isabs(relpath) or not path.startswith(os.path.abspath(root) + os.sep):
+        raise Exception(f"Refusing to extract {relpath} outside of {root}")
+    return path
+
+def _extract(src, path: str, size: int) -> tuple:
+    """
+    Streams a file from the archive next to `path`, comparing it with the file already at `path` on
+    the way: nothing is written as long as both are the same.
+
+    Returns:
+        (tmp, sha256): the file written, None if it's the same as the one at `path`
+    """
+    _hash = hashlib.sha256()
+    _tmp, dst, matched = f"{path}.tmp", None, 0
+    existing = open(path, "rb") if os.path.isfile(path) and os.path.getsize(path) == size else None
+
+    try:
+        while chunk := src.read(CHUNK_SIZE):
+            _hash.update(chunk)
+            if dst is None and existing is not None:
+                if existing.read(len(chunk)) == chunk:
+                    matched += len(chunk)
+                    continue
+                # Differs from here on, the part that matched is copied from the existing file.
+                existing.seek(0)
+                dst = open(_tmp, "wb")
+                while matched:
+                    matched -= dst.write(existing.read(min(CHUNK_SIZE, matched)))
+            elif dst is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                dst = open(_tmp, "wb")
+            dst.write(chunk)
+
+        if dst is None and existing is None:
+            # Empty file
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            dst = open(_tmp, "wb")
+    finally:
+        if existing is not None:
+            existing.close()
+        if dst is not None:
+            dst.close()
+
+    return (_tmp if dst is not None else None), _hash.hexdigest()
+
+def import_workspace(archive: str, root: str, overwrite_config: bool = False) -> dict:
+    """
+    Restores a workspace exported using `export_workspace` into `root`, streaming every file
+    straight from the archive. Files already present with the same content are left untouched,
+    so is an existing configuration file unless `overwrite_config` is set.
+
+    The manifest comes last, the extracted files are only moved in place once they've been checked
+    against it (the templates, small scripts, are kept in memory until then to be relocated).
+
+    Args:
+        archive: Path of the archive
+        root: The challenges folder to restore the workspace into
+        overwrite_config: Replace the configuration file (and its token) if there's one already
+    Returns:
+        Number of files "extracted" and "skipped", and whether the configuration was "kept"
+    """
+    stats = {"extracted": 0, "skipped": 0, "kept": False}
+    manifest = None
+    # relpath -> (path, tmp or template content or None if already present, sha256, mode)
+    pending = {}
+
+    try:
+        with tarfile.open(archive, "r|*") as tar:
+            for member in tar:
+                if member.name == MANIFEST:
+                    manifest = json.load(tar.extractfile(member))
+                    continue
+
+                if not member.isfile() or not member.name.startswith("workspace/"):
+                    continue
+
+                relpath = member.name[len("workspace/"):]
+                path = _safe_path(root, relpath)
+                if relpath == CONFIG and os.path.isfile(path) and not overwrite_config:
+                    stats["kept"] = True
+                    continue
+
+                with tar.extractfile(member) as src:
+                    if os.path.basename(path) in TEMPLATES:
+                        content = src.read()
+                        pending[relpath] = (path, content, hashlib.sha256(content).hexdigest(), member.mode)
+                    else:
+                        pending[relpath] = (path, *_extract(src, path, member.size), member.mode)
+
+        if manifest is None:
+            raise Exception("Not a workspace archive, the manifest is missing.")
+
+        for relpath, (path, extracted, sha256, mode) in pending.items():
+            if not (entry := manifest["files"].get(relpath)):
+                continue
+
+            if sha256 != entry["sha256"]:
+                logger.warning(f"{relpath} doesn't match its hash in the manifest, skipping.")
+                continue
+
+            if isinstance(extracted, bytes):
+                # Has the absolute path of the config directory baked in, moved to the new root.
+                extracted = _relocate(path, extracted, manifest["root"], root)
+
+            if extracted is None:
+                stats["skipped"] += 1
+                continue
+
+            os.replace(extracted, path)
+            os.chmod(path, mode & 0o777)
+            stats["extracted"] += 1
+    finally:
+        for path, extracted, _, _ in pending.values():
+            if isinstance(extracted, str) and os.path.exists(extracted):
+                os.remove(extracted)
+
+    return stats
+
+def _relocate(path: str, content: bytes, old_root: str, new_root: str) -> str:
+    """
+    Returns:
+        The relocated template written next to `path`, None if `path` already has the same content
+    """
+    content = content.replace(os.path.join(old_root, CONFIG_DIR).encode(), os.path.join(new_root, CONFIG_DIR).encode())
+    if os.path.isfile(path):
+        with open(path, "rb") as fp:
+            if fp.read() == content:
+                return None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as fp:
+        fp.write(content)
+    return f"{path}.tmp"
@@ -1,6 +1,12 @@
+import os
+import time
 from .logger import logger
 from .handler import RequestHandler, Mode, requests
 from .utils import get_env, fix_url
+from .models import ChallengeModel, ScoreboardEntryModel
+from .progress import Progress
+from .download import download_segmented, supports_ranges, RateLimiter
+from .events import EventStream
 
 class CTFd:
     """
@@ -51,54 +57,32 @@ class CTFd:
         )
         return r.status_code == 200
 
-class ChallengeModel:
-    """
-    Simple model for the challenges deployed on the CTFd instance.
-
-    Attributes:
-        id: The id of the challenge
-        name: The name of the challenge
-        category: The category of the challenge
-        type: The type of the challenge
-        is_downloaded: Whether the challenge is downloaded or not
-    """
-    def __init__(self, id: int, name: str, category: str, type: str, is_downloaded: bool = False, **kwargs):
-        self.id = id
-        self.name = name
-        self.category = category
-        self.type = type
-        self.is_downloaded = is_downloaded
-
-    def __str__(self):
-        return f"Challenge: {self.name} ({self.id})"
-    
-    def __repr__(self):
-        return f"Challenge: {self.name} ({self.id})"
-
-    def __dict__(self, no_id: bool = False):
-        _ = {
-            "name": self.name,
-            "category": self.category,
-            "type": self.type,
-            "is_downloaded": self.is_downloaded
-        }
-        if not no_id: _["id"] = self.id
-        return _
-
 class CTFd_Handler:
     """
     Class to interact with the CTFd instance.
 
     Attributes:
         ctfd: The CTFd object
+        progress: Progress renderer shared by all the downloads
+        segments: Number of parallel connections used for large files
+        segment_threshold: Size (in bytes) from which files are downloaded in segments
+        mirror: URL of a team mirror (`ctfd serve`) tried before the CTFd instance
+        mirror_key: The key of the team mirror, if it has one
+        limiter: Caps the combined rate of all the downloads (see `RateLimiter`)
 
     Methods:
 
         # Challenges
         get_challenges: Returns the list of all the challenges currently deployed
         get_challenge: Returns the challenge with the given id
+        fetch_challenge: Returns the challenge with the given id and when it was fetched from CTFd
+        get_file_size: Returns the size of a file without downloading it
         download_file: Downloads the file from the given url
 
+        # Notifications
+        get_notifications: Returns the notifications posted on the CTFd instance
+        events: Follows the /events stream of the CTFd instance
+
         # Flags
         submit_flag: Submits the flag for the challenge with the given id
 
@@ -107,9 +91,45 @@ class CTFd_Handler:
         extend_instance: Extends the challenge instance
         stop_instance: Stops the challenge instance
     """
-    def __init__(self, instance: str, token: str, skip: bool = False):
+    def __init__(self, instance: str, token: str, skip: bool = False, progress: Progress = None,
+                 segments: int = 4, segment_threshold: int = 64 * 1024 * 1024, mirror: str = None, limiter: RateLimiter = None,
+                 mirror_key: str = None):
         self.ctfd = CTFd(instance=instance, token=token, skip=skip)
-    
+        self.progress = progress or Progress()
+        self.segments = segments
+        self.segment_threshold = segment_threshold
+        self.mirror = fix_url(mirror) if mirror else None
+        self.mirror_key = mirror_key
+        self.limiter = limiter
+
+    def _from_mirror(self, path: str, stream: bool = False, method: str = "GET") -> requests.Response:
+        """
+        Fetches the path from the team mirror (see `ctfd serve`).
+
+        Returns:
+            The response if the mirror has it, None otherwise (the caller falls back to CTFd)
+        """
+        if not self.mirror:
+            return None
+
+        try:
+            headers = {"X-Mirror-Key": self.mirror_key} if self.mirror_key else {}
+            transport = RequestHandler.get_transport()
+            r = (transport.stream if stream else transport.request)(method, f"{self.mirror}{path}", headers=headers, timeout=5)
+        except requests.RequestException as E:
+            logger.warning(f"Mirror {self.mirror} is not reachable ({E.__str__()}), using CTFd instead.")
+            self.mirror = None
+            return None
+
+        if r.status_code == 401:
+            logger.warning(f"Mirror {self.mirror} needs its key (--mirror-key or $CTFD_MIRROR_KEY), using CTFd instead.")
+            self.mirror = None
+
+        if r.status_code != 200:
+            r.close()
+            return None
+        return r
+
     def get_challenges(self) -> list:
         """
         Returns the list of all the challenges currently deployed.
@@ -117,42 +137,125 @@ class CTFd_Handler:
         Returns:
             List of all the challenges currently deployed
         """
+        if r := self._from_mirror("/api/v1/challenges"):
+            return r.json()["data"]
+
         return RequestHandler.MakeRequest(
             mode=Mode.GET,
             url=f"{self.ctfd.ctfd_instance}/api/v1/challenges",
             token=self.ctfd.ctfd_token
         ).json()["data"]
 
-    def get_challenge(self, chal_id: int) -> dict:
+    def get_challenge(self, chal_id: int, mirror: bool = True) -> dict:
         """
         Fetches the challenge with the given id.
 
         Returns:
             The challenge information with the given id
         """
+        return self.fetch_challenge(chal_id, mirror)[0]
+
+    def fetch_challenge(self, chal_id: int, mirror: bool = True) -> tuple:
+        """
+        Fetches the challenge with the given id, from the team mirror if it has every attachment of
+        the challenge (the file links it hands out may have expired on CTFd) unless `mirror` is False.
+
+        Returns:
+            (details, updated): when the mirror fetched them from CTFd for details served by the mirror,
+            now otherwise
+        """
+        if mirror and (r := self._from_mirror(f"/api/v1/challenges/{chal_id}")):
+            _ = r.json()
+            return _["data"], _.get("updated") or time.time()
+
         _ = RequestHandler.MakeRequest(
             mode=Mode.GET,
             url=f"{self.ctfd.ctfd_instance}/api/v1/challenges/{chal_id}",
             token=self.ctfd.ctfd_token
         ).json()
         if "message" in _.keys():
+            return {}, None
+        return _["data"], time.time()
+    
+    def get_hint(self, hint_id: int) -> dict:
+        """
+        Fetches the hint with the given id.
+
+        Returns:
+            The hint (with its content) if it's unlocked, {} otherwise
+        """
+        _ = RequestHandler.MakeRequest(
+            mode=Mode.GET,
+            url=f"{self.ctfd.ctfd_instance}/api/v1/hints/{hint_id}",
+            token=self.ctfd.ctfd_token
+        ).json()
+        if not _.get("success"):
             return {}
         return _["data"]
-    
+
+    def get_file_size(self, endpoint: str) -> int:
+        """
+        Asks the team mirror, or CTFd (or wherever it redirects to), for the size of a file using a HEAD request.
+
+        Returns:
+            The size in bytes, None if the server doesn't tell
+        """
+        if (r := self._from_mirror(endpoint.split("?")[0], method="HEAD")) and (size := r.headers.get("Content-Length")):
+            return int(size)
+
+        try:
+            r = RequestHandler.get_transport().request("HEAD", f"{self.ctfd.ctfd_instance}{endpoint}", allow_redirects=True, timeout=10)
+        except requests.RequestException:
+            return None
+        if r.status_code != 200 or "Content-Encoding" in r.headers or not (size := r.headers.get("Content-Length")):
+            return None
+        return int(size)
+
+    def _write(self, r, filename: str, task) -> None:
+        with open(filename, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=65536):
+                f.write(chunk)
+                self.progress.update(task, len(chunk))
+                if self.limiter:
+                    self.limiter.consume(len(chunk))
+
     def download_file(self, endpoint: str, filename: str) -> None:
         """
-        Downloads the file from the given url.
+        Downloads the file from the given url. Progress is reported to `self.progress`,
+        which is shared by all the downloads of the handler.
+
+        Files of at least `segment_threshold` bytes are fetched as `segments` parallel byte
+        ranges when the server supports it, otherwise they're streamed over a single connection.
+        The file is taken from the team mirror if it has it.
         """
-        with requests.get(f"{self.ctfd.ctfd_instance}{endpoint}", stream=True, allow_redirects=True) as r:
+        r = self._from_mirror(endpoint.split("?")[0], stream=True) or \
+            RequestHandler.get_transport().stream("GET", f"{self.ctfd.ctfd_instance}{endpoint}", allow_redirects=True)
+
+        with r:
             r.raise_for_status()
-            total_length = int(r.headers.get('content-length'))
-            downloaded = 0
-            with open(filename, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    print(f"\r[\x1b[32;20mDOWNLOADING\x1b[0m] {downloaded}/{total_length} bytes downloaded", end="")
-            print("\r", end="")
+            total_length = r.headers.get('content-length')
+            total_length = int(total_length) if total_length else None
+            task = self.progress.add(os.path.basename(filename), total_length)
+
+            try:
+                if self.segments > 1 and total_length and total_length >= self.segment_threshold and supports_ranges(r):
+                    # The url we got redirected to (e.g. S3) is the one that serves the ranges.
+                    url = r.url
+                    r.close()
+                    try:
+                        download_segmented(url, filename, total_length, self.segments, self.progress, task, self.limiter)
+                        logger.info(f"File downloaded to {filename}")
+                        return
+                    except Exception as E:
+                        logger.warning(f"Segmented download failed ({E.__str__()}), falling back to a single stream.")
+                        self.progress.update(task, -task.done)
+                        with RequestHandler.get_transport().stream("GET", url) as fallback:
+                            fallback.raise_for_status()
+                            self._write(fallback, filename, task)
+                else:
+                    self._write(r, filename, task)
+            finally:
+                self.progress.finish(task)
             logger.info(f"File downloaded to {filename}")
 
     def submit_flag(self, chal_id: int, flag: str) -> dict:
@@ -224,6 +327,20 @@ class CTFd_Handler:
             token=self.ctfd.ctfd_token,
         ).json()["data"]
     
+    def get_standings(self) -> list:
+        """
+        Fetches the whole scoreboard (every ranked user/team, without their solves).
+
+        Returns:
+            List of `ScoreboardEntryModel`
+        """
+        data = RequestHandler.MakeRequest(
+            mode=Mode.GET,
+            url=f"{self.ctfd.ctfd_instance}/api/v1/scoreboard",
+            token=self.ctfd.ctfd_token,
+        ).json()["data"]
+        return [ScoreboardEntryModel.from_api(entry) for entry in data]
+
     def get_solves(self, chal_id: int) -> dict:
         """
         Fetches the solves for the challenge with the given id.
@@ -235,4 +352,26 @@ class CTFd_Handler:
             mode=Mode.GET,
             url=f"{self.ctfd.ctfd_instance}/api/v1/challenges/{chal_id}/solves",
             token=self.ctfd.ctfd_token
-        ).json()["data"]
\ No newline at end of file
+        ).json()["data"]
+
+    def get_notifications(self) -> list:
+        """
+        Fetches the notifications (announcements) posted on the CTFd instance.
+
+        Returns:
+            The response from the CTFd instance
+        """
+        return RequestHandler.MakeRequest(
+            mode=Mode.GET,
+            url=f"{self.ctfd.ctfd_instance}/api/v1/notifications",
+            token=self.ctfd.ctfd_token
+        ).json()["data"]
+
+    def events(self, last_id: str = None):
+        """
+        Follows the server-sent events stream of the CTFd instance.
+
+        Returns:
+            Generator yielding the events as they arrive
+        """
+        return EventStream(self.ctfd.ctfd_instance, self.ctfd.ctfd_token, last_id).follow()
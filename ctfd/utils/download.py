@@ -0,0 +1,123 @@
+import os
+import time
+import requests
+import threading
+from .handler import RequestHandler
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from .progress import Progress, Task
+
+CHUNK_SIZE = 65536
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_size(size: str) -> int:
+    """
+    Returns:
+        The number of bytes of a size such as 500K, 2M or 1.5G (powers of 1024)
+    """
+    size = size.strip().upper()
+    for suffix in ("B", "I"):
+        size = size[:-1] if size.endswith(suffix) else size
+    unit = size[-1] if size and size[-1] in UNITS else ""
+    return int(float(size[:len(size) - len(unit)]) * UNITS[unit])
+
+class RateLimiter:
+    """
+    Token bucket shared by every download (and every segment of a download), so their combined
+    rate stays under `rate` bytes per second.
+
+    Methods:
+        consume: Blocks until `n` more bytes can be read without going over the rate
+    """
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.capacity = max(rate, CHUNK_SIZE)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # Going into debt lets the caller read right away, the next callers wait it off.
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def supports_ranges(r: requests.Response) -> bool:
+    """
+    Returns:
+        True if the server advertises byte range support for the response
+    """
+    return r.headers.get("Accept-Ranges", "").lower() == "bytes" and "Content-Encoding" not in r.headers
+
+def split_ranges(total: int, segments: int) -> list:
+    """
+    Splits `total` bytes into at most `segments` contiguous (start, end) ranges, end inclusive.
+    """
+    size = -(-total // segments)
+    return [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+def _preallocate(fd: int, total: int) -> None:
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, total)
+            return
+        except OSError:
+            # Not supported by every filesystem (e.g. some network mounts)
+            pass
+    os.ftruncate(fd, total)
+
+def _fetch_range(url: str, fd: int, start: int, end: int, progress: Progress, task: Task, limiter: RateLimiter = None, stop: threading.Event = None) -> None:
+    with RequestHandler.get_transport().stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as r:
+        if r.status_code != 206:
+            raise Exception(f"Range request returned {r.status_code} instead of 206")
+
+        offset = start
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            if stop is not None and stop.is_set():
+                # Another segment failed, the whole download is dropped.
+                return
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+            progress.update(task, len(chunk))
+            if limiter:
+                limiter.consume(len(chunk))
+
+    if offset != end + 1:
+        raise Exception(f"Segment {start}-{end} ended early at {offset}")
+
+def download_segmented(url: str, filename: str, total: int, segments: int, progress: Progress, task: Task, limiter: RateLimiter = None) -> None:
+    """
+    Downloads `url` as `segments` byte ranges fetched in parallel, every segment is written at its
+    own offset into a preallocated file.
+
+    Raises:
+        Exception if any of the segments failed, the partial file is removed. The other segments
+        are stopped right away rather than downloaded for nothing.
+    """
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    stop = threading.Event()
+    try:
+        _preallocate(fd, total)
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            futures = [pool.submit(_fetch_range, url, fd, start, end, progress, task, limiter, stop) for start, end in split_ranges(total, segments)]
+            try:
+                wait(futures, return_when=FIRST_EXCEPTION)
+            finally:
+                # On a failure (or Ctrl+C) the queued segments are cancelled and the running ones stop at
+                # their next chunk, they must be done before the fd is closed.
+                stop.set()
+                for future in futures:
+                    future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.result()
+    except BaseException:
+        os.close(fd)
+        os.remove(filename)
+        raise
+    os.close(fd)
@@ -0,0 +1,92 @@
+import os
+
+DOWNLOADED = "downloaded"
+PARTIAL = "partial"
+
+# Written last by `download_challenge`, a challenge folder without it was never fully downloaded.
+README = "README.md"
+
+def challenge_slug(name: str) -> str:
+    """
+    Returns:
+        The name of the folder a challenge is downloaded to
+    """
+    return name.replace(" ", "-")
+
+def challenge_folder(chals_folder: str, category: str, name: str) -> str:
+    return os.path.join(chals_folder, category or "", challenge_slug(name))
+
+def file_stats(chal_folder: str, files: list) -> dict:
+    """
+    Returns:
+        File name -> [size, mtime] of the given files of a challenge folder, recorded once a challenge
+        is downloaded so `scan_downloads` can detect truncated attachments later on.
+    """
+    stats = {}
+    for file in files:
+        st = os.stat(os.path.join(chal_folder, file))
+        stats[file] = [st.st_size, st.st_mtime]
+    return stats
+
+def _scandir(path: str):
+    try:
+        with os.scandir(path) as it:
+            yield from it
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return
+
+def scan_folder(chals_folder: str) -> dict:
+    """
+    Walks `chals_folder/<category>/<challenge>/` once using `os.scandir`, so every directory is listed a
+    single time and only the files are stat'd (the directory entries already tell files from folders).
+
+    Returns:
+        (category, slug) -> {file name: (size, mtime)} for every challenge folder found
+    """
+    folders = {}
+    for category in _scandir(chals_folder):
+        # Skips the .ctfd state folder (and any other hidden folder)
+        if category.name.startswith(".") or not category.is_dir():
+            continue
+        for chal in _scandir(category.path):
+            if not chal.is_dir():
+                continue
+            files = {}
+            for entry in _scandir(chal.path):
+                if entry.is_file():
+                    st = entry.stat()
+                    files[entry.name] = (st.st_size, st.st_mtime)
+            folders[(category.name, chal.name)] = files
+    return folders
+
+def scan_downloads(challenges: list, chals_folder: str, snapshot = None) -> dict:
+    """
+    Finds the download state of the challenges with a single scan of `chals_folder`.
+
+    A challenge is downloaded when its README.md exists and every attachment recorded in the snapshot
+    (see `file_stats`) is still there with the same size. It's partial when its folder exists but the
+    README.md is missing or an attachment is missing or truncated (e.g. an interrupted download).
+
+    Args:
+        challenges: The challenges (dicts with id, name and category)
+        chals_folder: The folder the challenges are downloaded to
+        snapshot: The workspace snapshot holding the recorded file sizes, optional
+    Returns:
+        Challenge id -> DOWNLOADED or PARTIAL, challenges without a folder are left out
+    """
+    folders = scan_folder(chals_folder)
+    recorded = snapshot.data.get("downloads", {}) if snapshot is not None else {}
+
+    states = {}
+    for chal in challenges:
+        if (files := folders.get((chal.get("category") or "", challenge_slug(chal["name"])))) is None:
+            continue
+
+        state = DOWNLOADED if README in files else PARTIAL
+        if entry := recorded.get(str(chal["id"])):
+            for name, (size, _) in entry["data"].items():
+                if name not in files or files[name][0] != size:
+                    state = PARTIAL
+                    break
+        states[chal["id"]] = state
+    return states
@@ -0,0 +1,139 @@
+import time
+import json
+import requests
+from .logger import logger
+from .handler import RequestHandler
+
+# Events after which the challenges may have changed. CTFd itself only sends notifications (new
+# challenges and hints are announced through them), plugins may send the others.
+SYNC_EVENTS = ("notification", "challenge", "hint")
+
+class Event:
+    """
+    A single server-sent event.
+
+    Attributes:
+        id: The id of the event (sent back as Last-Event-ID when reconnecting)
+        event: The type of the event (e.g. "notification")
+        data: The payload of the event
+    """
+    __slots__ = ("id", "event", "data")
+
+    def __init__(self, id: str = None, event: str = "message", data: str = ""):
+        self.id = id
+        self.event = event
+        self.data = data
+
+    def json(self):
+        return json.loads(self.data)
+
+    def __repr__(self):
+        return f"Event({self.event}, {self.id})"
+
+class EventParser:
+    """
+    Incremental parser for a text/event-stream. Chunks can be fed as they arrive from the
+    network and complete events are returned as soon as their terminating blank line is seen.
+
+    Attributes:
+        last_id: The id of the last event seen
+        retry: The reconnection time (in ms) requested by the server, if any
+
+    Methods:
+        feed: Parses a chunk of the stream and returns the events it completed
+    """
+
+    def __init__(self, last_id: str = None):
+        self.last_id = last_id
+        self.retry = None
+        self._buffer = b""
+        self._event = None
+        self._data = []
+
+    def feed(self, chunk: bytes) -> list:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+
+        events = []
+        for line in lines:
+            line = line.rstrip(b"\r").decode("utf-8", errors="replace")
+
+            if not line:
+                if self._data:
+                    events.append(Event(self.last_id, self._event or "message", "\n".join(self._data)))
+                self._event, self._data = None, []
+                continue
+
+            if line.startswith(":"):
+                continue
+
+            field, _, value = line.partition(":")
+            if value.startswith(" "):
+                value = value[1:]
+
+            if field == "data":
+                self._data.append(value)
+            elif field == "event":
+                self._event = value
+            elif field == "id" and "\0" not in value:
+                self.last_id = value
+            elif field == "retry" and value.isdigit():
+                self.retry = int(value)
+
+        return events
+
+class EventStream:
+    """
+    Follows the /events stream of a CTFd instance over a single long-lived connection,
+    reconnecting with Last-Event-ID whenever the connection drops.
+
+    Attributes:
+        url: The URL of the CTFd instance
+        token: The token to interact with the CTFd instance (replaced by the refreshed one, see `RequestHandler.refresh_token`)
+        last_id: The id of the last event received
+
+    Methods:
+        follow: Yields the events as they arrive, forever
+    """
+
+    def __init__(self, url: str, token: str, last_id: str = None, reconnect: float = 3.0, max_reconnect: float = 60.0):
+        self.url = url
+        self.token = token
+        self.last_id = last_id
+        self.reconnect = reconnect
+        self.max_reconnect = max_reconnect
+
+    def follow(self):
+        delay = self.reconnect
+        while True:
+            token = RequestHandler.current_token(self.token)
+            headers = {
+                "Authorization": f"Token {token}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+                "Cache-Control": "no-cache"
+            }
+            if self.last_id:
+                headers["Last-Event-ID"] = self.last_id
+
+            parser = EventParser(self.last_id)
+            try:
+                with RequestHandler.get_transport().stream("GET", f"{self.url}/events", headers=headers, timeout=(10, None)) as r:
+                    if r.status_code in (401, 403) and RequestHandler.refresh_token(token) != token:
+                        logger.info("Token refreshed, reconnecting to the event stream.")
+                        continue
+                    r.raise_for_status()
+                    delay = self.reconnect
+                    for chunk in r.iter_content(chunk_size=None):
+                        for event in parser.feed(chunk):
+                            self.last_id = event.id
+                            yield event
+                logger.warning("Event stream closed by the server.")
+            except requests.RequestException as E:
+                logger.warning(f"Event stream disconnected: {E.__str__()}")
+
+            if parser.retry:
+                delay = parser.retry / 1000
+            logger.info(f"Reconnecting in {delay:g}s")
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect)
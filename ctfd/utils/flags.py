@@ -0,0 +1,83 @@
+import re
+import hashlib
+
+# Statuses of the attempts CTFd answered without checking the flag, they can be tried again.
+UNCHECKED = ("paused", "ratelimited")
+
+def flag_hash(challenge_id: int, flag: str) -> str:
+    return hashlib.sha256(f"{challenge_id}:{flag}".encode()).hexdigest()
+
+class FlagFilter:
+    """
+    Checks flags locally before they're sent to CTFd, so malformed or already tried flags
+    don't burn the rate limit.
+
+    Attributes:
+        regex: The flag format, the whole flag must match it
+        prefix: The prefix every flag starts with (e.g. `flag{`)
+        ledger: The flags already submitted (see `Ledger`)
+
+    Methods:
+        check: Returns the reason a single flag would be rejected
+        filter: Filters a list of candidates in a single pass
+    """
+
+    def __init__(self, regex: str = None, prefix: str = None, ledger = None):
+        self.regex = re.compile(regex) if regex else None
+        self.prefix = prefix or ""
+        self.ledger = ledger
+
+    @staticmethod
+    def from_config(config: dict, ledger = None) -> "FlagFilter":
+        ctfd = config.get("CTFD", {})
+        return FlagFilter(ctfd.get("FLAG_FORMAT"), ctfd.get("FLAG_PREFIX"), ledger)
+
+    def check(self, challenge_id: int, flag: str) -> str:
+        """
+        Returns:
+            None if the flag can be submitted, the reason it's rejected otherwise
+        """
+        if not flag.startswith(self.prefix):
+            return f"doesn't start with {self.prefix}"
+
+        if self.regex and not self.regex.fullmatch(flag):
+            return f"doesn't match the flag format {self.regex.pattern}"
+
+        if self.ledger is not None and (challenge_id, flag) in self.ledger:
+            return "was already submitted"
+
+        return None
+
+    def filter(self, challenge_id: int, candidates) -> tuple:
+        """
+        Args:
+            challenge_id: The challenge the candidates are for
+            candidates: Iterable of candidate flags (surrounding whitespace is stripped)
+        Returns:
+            (flags, stats): the candidates that passed all the checks in their original order,
+            and the number of candidates dropped per reason.
+        """
+        prefix, fullmatch = self.prefix, self.regex.fullmatch if self.regex else None
+        attempted = self.ledger.hashes if self.ledger is not None else ()
+
+        seen = set()
+        flags = []
+        stats = {"total": 0, "empty": 0, "duplicate": 0, "malformed": 0, "attempted": 0}
+
+        for flag in candidates:
+            stats["total"] += 1
+            flag = flag.strip()
+
+            if not flag:
+                stats["empty"] += 1
+            elif flag in seen:
+                stats["duplicate"] += 1
+            elif not flag.startswith(prefix) or (fullmatch and not fullmatch(flag)):
+                stats["malformed"] += 1
+            elif attempted and flag_hash(challenge_id, flag) in attempted:
+                stats["attempted"] += 1
+            else:
+                flags.append(flag)
+            seen.add(flag)
+
+        return flags, stats
@@ -1,5 +1,8 @@
 import requests
 import re
+import os
+import json
+import getpass
 from .utils import fix_url, get_env
 from .logger import logger
 from datetime import datetime
@@ -8,19 +11,27 @@ class GenerateToken(object):
     """
     Class to generate a token for the CTFd instance.
 
+    The session cookies are persisted to `cookie_jar` (if given) so later runs can reuse the
+    authenticated session instead of logging in again.
+
     Attributes:
         url: The URL of the CTFd instance
         username: The username to login with
         password: The password to login with
+        cookie_jar: Path to the file the session cookies are persisted to
 
     Methods:
         generate_token: Generates a token for the CTFd instance
+        refresh: Generates a new token, meant to be used when the API returns 401/403
+        is_token_valid: Checks whether a token is still accepted by the CTFd instance
 
     """
 
-    def __init__(self, url: str, username: str, password: str):
+    def __init__(self, url: str, username: str = None, password: str = None, cookie_jar: str = None):
         self.username = username
         self.password = password
+        self.cookie_jar = cookie_jar
+        self.nonce = None
 
         self.url = fix_url(
             get_env(
@@ -29,37 +40,126 @@ class GenerateToken(object):
                 err_msg = "Environment variable \"CTFD_URL\" is not set"
             ))
         self.session = requests.Session()
-
-    def __get_csrf_nonce(self, page = "") -> str:
+        self._load_cookies()
+
+    def _load_cookies(self) -> None:
+        if not self.cookie_jar or not os.path.exists(self.cookie_jar):
+            return
+
+        try:
+            with open(self.cookie_jar) as fp:
+                cookies = json.load(fp).get(self.url, [])
+        except (OSError, ValueError):
+            return
+
+        for cookie in cookies:
+            self.session.cookies.set(**cookie)
+
+    def _save_cookies(self) -> None:
+        if not self.cookie_jar:
+            return
+
+        try:
+            with open(self.cookie_jar) as fp:
+                jar = json.load(fp)
+        except (OSError, ValueError):
+            jar = {}
+
+        jar[self.url] = [{
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires,
+            "secure": cookie.secure
+        } for cookie in self.session.cookies]
+
+        # The session cookie is as good as the password, only the user may read it.
+        fd = os.open(self.cookie_jar, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(jar, fp)
+
+    @staticmethod
+    def __extract_csrf_nonce(html: str) -> str:
         """
         Args:
-            page: The page to get the CSRF token from
+            html: The page to extract the CSRF token from
         Returns:
-            The CSRF token from the page
+            The CSRF token from the page, None if the page doesn't have it
         """
+        if nonce := re.findall("'csrfNonce': \"(.*?)\"", html):
+            return nonce[0]
+        return None
 
-        r = self.session.get(f"{self.url}{page}")
-        return re.findall("'csrfNonce': \"(.*?)\"", r.text)[0]
+    def _is_logged_in(self) -> bool:
+        """
+        Checks whether the persisted session is still logged in. The settings page
+        redirects to /login otherwise, either way the page carries the CSRF nonce.
+        """
+        r = self.session.get(f"{self.url}/settings")
+        self.nonce = self.__extract_csrf_nonce(r.text)
+        return r.status_code == 200 and "/login" not in r.url and self.nonce is not None
 
     def _login(self) -> None:
         """
-        Logs in to the CTFd instance using the provided credentials
+        Logs in to the CTFd instance using the provided credentials, unless the persisted
+        session is still valid.
         """
+        if self.session.cookies and self._is_logged_in():
+            logger.info("Reusing the existing session.")
+            return
+
+        if not self.username:
+            logger.error("Session expired or not found. Please specify --name to login.")
+            exit(1)
+
+        if not self.password:
+            self.password = getpass.getpass("Enter the password: ")
+
         logger.info(f"Logging in as: {self.username}")
 
+        if not self.nonce:
+            self.nonce = self.__extract_csrf_nonce(self.session.get(f"{self.url}/login").text)
+
         r = self.session.post(f"{self.url}/login", data={
 			"name": self.username,
 			"password": self.password,
 			"_submit": "Submit",
-			"nonce": self.__get_csrf_nonce()
+			"nonce": self.nonce
 		})
 
         if r.status_code != 200 and r.status_code != 302:
             logger.error(f"Unable to login!\nError: {r.text}")
             exit(1)
 
+        # CTFd renders the login page again on bad credentials instead of redirecting.
+        if "/login" in r.url:
+            logger.error("Unable to login! Please check the credentials.")
+            exit(1)
+
+        # The nonce is regenerated on login, the page we got redirected to already has the new one.
+        self.nonce = self.__extract_csrf_nonce(r.text)
+        if not self.nonce:
+            logger.error("Unable to login! Please check the credentials.")
+            exit(1)
+
+        self._save_cookies()
         logger.info(f"Logged in successfully as {self.username}")
 
+    def is_token_valid(self, token: str) -> bool:
+        """
+        Returns:
+            True if the CTFd instance accepts the token, False otherwise
+        """
+        if not token:
+            return False
+
+        r = requests.get(f"{self.url}/api/v1/users/me", headers={
+            "Authorization": f"Token {token}",
+            "Content-Type": "application/json"
+        })
+        return r.status_code == 200
+
     def generate_token(self) -> str:
         """
         Returns:
@@ -69,7 +169,7 @@ class GenerateToken(object):
         # Expire 1 year from now
         date_now = datetime.now()
         expiry = date_now.replace(year=(date_now.year + 1)).strftime('%Y-%m-%d')
-        
+
         self._login()
 
         logger.info("Generating token.")
@@ -78,15 +178,34 @@ class GenerateToken(object):
                 "description": "Token generated by TheFlash2k's Auto CTFd",
                 "expiration": expiry
             }, headers = {
-                "CSRF-Token": self.__get_csrf_nonce()
+                "CSRF-Token": self.nonce
             }
         )
 
         if r.status_code != 200:
             logger.error(f"Unable to generate token. Error: {r.text}")
             exit(1)
-        
+
         token = r.json()["data"]["value"]
         logger.info(f"Generated token: {token}")
 
-        return token
\ No newline at end of file
+        return token
+
+    def refresh(self, token: str = None) -> str:
+        """
+        Generates a new token if `token` is no longer accepted (i.e. the API returns 401/403).
+        Called by `RequestHandler` whenever a request is rejected, see `RequestHandler.set_token_refresh`.
+
+        Returns:
+            `token` if it is still valid or no new one can be generated without the credentials,
+            a freshly generated token otherwise
+        """
+        if self.is_token_valid(token):
+            return token
+
+        if not self.username and not (self.session.cookies and self._is_logged_in()):
+            logger.warning("Token is no longer valid and the session has expired. Please run `ctfd generate-token --name <NAME>`.")
+            return token
+
+        logger.warning("Token is no longer valid, generating a new one.")
+        return self.generate_token()
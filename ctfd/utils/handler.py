@@ -1,7 +1,14 @@
+import time
 import requests
+import threading
 from .logger import logger
+from .transport import Transport, get_transport
 from enum import Enum
 
+# CTFd also answers 403 for locked hints, hidden challenges or while paused, a token found to be
+# valid is only checked again after this many seconds.
+REFRESH_INTERVAL = 60
+
 class Mode(Enum):
     GET = requests.get
     POST = requests.post
@@ -11,17 +18,103 @@ class Mode(Enum):
 
 class RequestHandler:
 
+    # Shared by every request, see `set_transport`
+    transport: Transport = None
+
+    # Called with a token the API rejected (401/403), returns the token to use instead, see `set_token_refresh`
+    token_refresh = None
+    # Token -> token that replaced it
+    refreshed: dict = {}
+    # Token -> when it was last found to be valid (or impossible to replace)
+    checked: dict = {}
+    _refresh_lock = threading.Lock()
+
+    @staticmethod
+    def set_transport(name: str = None) -> None:
+        """
+        Selects the transport used for all the requests ("requests" or "http2").
+        """
+        RequestHandler.transport = get_transport(name)
+
+    @staticmethod
+    def get_transport() -> Transport:
+        """
+        Returns:
+            The transport shared by all the requests (API calls, downloads and the event stream)
+        """
+        if RequestHandler.transport is None:
+            RequestHandler.set_transport()
+        return RequestHandler.transport
+
+    @staticmethod
+    def set_token_refresh(callback) -> None:
+        """
+        Sets the callback used to replace a token the API no longer accepts (see `GenerateToken.refresh`).
+        """
+        RequestHandler.token_refresh = callback
+        RequestHandler.refreshed = {}
+        RequestHandler.checked = {}
+
+    @staticmethod
+    def current_token(token: str) -> str:
+        """
+        Returns:
+            The token that replaced `token` (possibly several times over), `token` if it wasn't replaced
+        """
+        while token in RequestHandler.refreshed:
+            token = RequestHandler.refreshed[token]
+        return token
+
+    @staticmethod
+    def refresh_token(token: str) -> str:
+        """
+        Called when a request made with `token` is rejected (401/403).
+
+        Returns:
+            The token to retry with, the same token if it can't (or doesn't need to) be refreshed
+        """
+        if not RequestHandler.token_refresh:
+            return token
+
+        with RequestHandler._refresh_lock:
+            # Requests made concurrently may all get rejected, only the first one refreshes the token.
+            if (new := RequestHandler.current_token(token)) != token:
+                return new
+            if time.monotonic() - RequestHandler.checked.get(token, -REFRESH_INTERVAL) < REFRESH_INTERVAL:
+                return token
+
+            try:
+                new = RequestHandler.token_refresh(token) or token
+            except Exception as E:
+                logger.error(f"Unable to refresh the token: {E.__str__()}")
+                new = token
+
+            if new != token:
+                RequestHandler.refreshed[token] = new
+            else:
+                RequestHandler.checked[token] = time.monotonic()
+            return new
+
     @staticmethod
     def MakeRequest(mode : Mode, url: str, token, headers: dict = {}, **kwargs):
 
         if token == None:
             raise Exception("Token is not set. Required for requests.")
 
-        headers["Authorization"] = f"Token {token}"
-        headers["Content-Type"] = "application/json"
-        headers["User-Agent"] = "CTFd-CLI-v0.1-by-@TheFlash2k" # Cuz why not..
+        token = RequestHandler.current_token(token)
+        _headers = {
+            **headers,
+            "Content-Type": "application/json",
+            "User-Agent": "CTFd-CLI-v0.1-by-@TheFlash2k" # Cuz why not..
+        }
 
         try:
-            return mode(url, headers=headers, **kwargs)
+            # The Mode "members" are the requests functions themselves, their name is the HTTP method.
+            method = getattr(mode, "value", mode).__name__.upper()
+            r = RequestHandler.get_transport().request(method, url, headers={**_headers, "Authorization": f"Token {token}"}, **kwargs)
+
+            if r.status_code in (401, 403) and (new := RequestHandler.refresh_token(token)) != token:
+                r = RequestHandler.get_transport().request(method, url, headers={**_headers, "Authorization": f"Token {new}"}, **kwargs)
+            return r
         except Exception as E:
-            logger.error(f"An error occurred when making a request to {url}: {E.__str__()}")
\ No newline at end of file
+            logger.error(f"An error occurred when making a request to {url}: {E.__str__()}")
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import getpass
+from .flags import flag_hash, UNCHECKED
+
+class Record:
+    """
+    A single flag submission stored in the ledger.
+
+    Attributes:
+        challenge_id: The challenge the flag was submitted for
+        hash: sha256 of the challenge id and the flag (see `flag_hash`)
+        flag: The flag itself, only stored if enabled
+        status: The status returned by CTFd ("correct", "incorrect", ...)
+        time: When the flag was submitted (unix timestamp)
+        latency: How long CTFd took to answer, in milliseconds
+        user: The local user that submitted the flag
+    """
+    __slots__ = ("challenge_id", "hash", "flag", "status", "time", "latency", "user")
+
+    # Keys used on disk, kept short since the ledger can grow to thousands of lines.
+    KEYS = ("c", "h", "f", "s", "t", "l", "u")
+
+    def __init__(self, challenge_id: int, hash: str, status: str, time: float, latency: int = None, user: str = None, flag: str = None):
+        self.challenge_id = challenge_id
+        self.hash = hash
+        self.flag = flag
+        self.status = status
+        self.time = time
+        self.latency = latency
+        self.user = user
+
+    def dumps(self) -> str:
+        return json.dumps({key: getattr(self, attr) for key, attr in zip(self.KEYS, self.__slots__) if getattr(self, attr) is not None}, separators=(",", ":"))
+
+    @staticmethod
+    def loads(line: str) -> "Record":
+        _ = json.loads(line)
+        return Record(**{attr: _.get(key) for key, attr in zip(Record.KEYS, Record.__slots__)})
+
+class Ledger:
+    """
+    Append-only log of every flag submitted from the workspace.
+
+    The log is read once and indexed by challenge and by status, and the set of hashes is used
+    to drop flags that were already tried before they hit the network.
+
+    Attributes:
+        path: Path to the ledger file
+        store_flags: Whether the flags are stored in plaintext (only their hash otherwise)
+
+    Methods:
+        record: Appends a submission to the ledger
+        query: Returns the submissions matching the given challenge/status
+        __contains__: Checks whether (challenge_id, flag) was already submitted
+    """
+
+    def __init__(self, path: str, store_flags: bool = False):
+        self.path = path
+        self.store_flags = store_flags
+        self._records = None
+        self._by_challenge = {}
+        self._by_status = {}
+        self._hashes = set()
+
+    def _index(self, record: Record) -> None:
+        position = len(self._records)
+        self._records.append(record)
+        self._by_challenge.setdefault(record.challenge_id, []).append(position)
+        self._by_status.setdefault(record.status, []).append(position)
+        # Paused and rate limited attempts were never checked by CTFd, they can be tried again.
+        if record.status not in UNCHECKED:
+            self._hashes.add(record.hash)
+
+    def _load(self) -> None:
+        if self._records is not None:
+            return
+
+        self._records = []
+        if os.path.exists(self.path):
+            with open(self.path) as fp:
+                for line in fp:
+                    if line.strip():
+                        self._index(Record.loads(line))
+
+    @property
+    def hashes(self) -> set:
+        self._load()
+        return self._hashes
+
+    def __contains__(self, attempt: tuple) -> bool:
+        return flag_hash(*attempt) in self.hashes
+
+    def __len__(self):
+        self._load()
+        return len(self._records)
+
+    @staticmethod
+    def _user() -> str:
+        # No login name in containers running as a uid without a passwd entry, the submission went through anyway.
+        try:
+            return getpass.getuser()
+        except (KeyError, OSError, ImportError):
+            return None
+
+    def record(self, challenge_id: int, flag: str, status: str, latency: float = None) -> Record:
+        """
+        Args:
+            challenge_id: The challenge the flag was submitted for
+            flag: The submitted flag
+            status: The status returned by CTFd
+            latency: How long the submission took, in seconds
+        """
+        self._load()
+        record = Record(
+            challenge_id=challenge_id,
+            hash=flag_hash(challenge_id, flag),
+            flag=flag if self.store_flags else None,
+            status=status,
+            time=round(time.time(), 3),
+            latency=round(latency * 1000) if latency is not None else None,
+            user=self._user()
+        )
+
+        with open(self.path, "a") as fp:
+            fp.write(record.dumps() + "\n")
+        self._index(record)
+        return record
+
+    def query(self, challenge_id: int = None, status: str = None, limit: int = None) -> list:
+        """
+        Returns:
+            The matching submissions, oldest first (only the last `limit` ones if given)
+        """
+        self._load()
+
+        positions = None
+        if challenge_id is not None:
+            positions = set(self._by_challenge.get(challenge_id, []))
+        if status is not None:
+            _positions = set(self._by_status.get(status, []))
+            positions = _positions if positions is None else positions & _positions
+
+        records = self._records if positions is None else [self._records[position] for position in sorted(positions)]
+        return records[-limit:] if limit else records
@@ -35,6 +35,11 @@ class Logger(object):
                 logging.CRITICAL: f"[{bold_red}{format.split()[1]}{reset}] {format.split()[2]}",
             }
     
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                # One formatter per level, built once instead of for every record.
+                self._formatters = {level: logging.Formatter(fmt) for level, fmt in self.FORMATS.items()}
+
             def format(self, record : logging.LogRecord) -> str:
 
                 """Format the log record.
@@ -44,8 +49,9 @@ class Logger(object):
                 Returns:
                     Formatted log record
                 """
-                log_fmt = self.FORMATS.get(record.levelno)
-                formatter = logging.Formatter(log_fmt)
+                formatter = self._formatters.get(record.levelno)
+                if formatter is None:
+                    formatter = self._formatters[record.levelno] = logging.Formatter(self.FORMATS.get(record.levelno))
                 return formatter.format(record)
     
     @staticmethod
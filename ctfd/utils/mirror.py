@@ -0,0 +1,164 @@
+import os
+import hmac
+import json
+import shutil
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from .logger import logger
+from .downloads import challenge_folder
+
+class MirrorServer(ThreadingHTTPServer):
+    """
+    Serves the synced challenges and the downloaded attachments of a workspace to the rest
+    of the team, using the same paths as CTFd so `CTFd_Handler(mirror=...)` can use it as is.
+
+    Only the challenge list, the challenge details and the attachments are exposed, never the
+    configuration (token) or any other workspace state. They still hold unlocked hints and signed
+    file links, so when a `key` is set every request must send it in the X-Mirror-Key header.
+
+    The listings are built once and only rebuilt when the configuration or snapshot file changes.
+
+    Attributes:
+        config: Path to the configuration file of the workspace
+        snapshot: The snapshot holding the challenge details
+        chals_folder: The folder the challenges are downloaded to
+        key: The shared key the clients must send, None to allow everyone
+
+    Routes:
+        /api/v1/challenges: The synced challenges
+        /api/v1/challenges/<id>: The details of a challenge whose attachments are all downloaded, along
+            with when they were fetched from CTFd (the file links expire after an hour, the clients
+            download the attachments from the mirror instead)
+        /files/...: The attachments of the downloaded challenges (GET and HEAD)
+    """
+    daemon_threads = True
+
+    def __init__(self, address: tuple, config: str, snapshot, chals_folder: str, key: str = None):
+        super().__init__(address, MirrorRequestHandler)
+        self.config = config
+        self.snapshot = snapshot
+        self.chals_folder = chals_folder
+        self.key = key
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def authorized(self, key: str) -> bool:
+        return not self.key or hmac.compare_digest((key or "").encode(), self.key.encode())
+
+    def _cached(self, name: str, path: str, build):
+        """
+        Returns:
+            The result of `build()`, built again only when the file at `path` changed
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if (entry := self._cache.get(name)) and entry[0] == mtime:
+                return entry[1]
+            if path == self.snapshot.path:
+                # Picks up the challenges downloaded while serving
+                self.snapshot.reload()
+            value = build()
+            self._cache[name] = (mtime, value)
+            return value
+
+    def challenges(self) -> list:
+        return self._cached("challenges", self.config, self._challenges)
+
+    def _challenges(self) -> list:
+        with open(self.config) as fp:
+            challenges = json.load(fp).get("Challenges", [])
+        return [{key: value for key, value in chal.items() if key != "is_downloaded"} for chal in challenges]
+
+    def challenge(self, chal_id: str) -> dict:
+        """
+        Returns:
+            The snapshot entry ({"data": ..., "updated": ...}) of the challenge, None if it's unknown
+            or some of its attachments aren't downloaded
+        """
+        if not (entry := self._cached("details", self.snapshot.path, lambda: dict(self.snapshot.data.get("challenges", {}))).get(str(chal_id))):
+            return None
+
+        files = self.files()
+        if any(file.split("?")[0] not in files for file in entry["data"].get("files", [])):
+            return None
+        return entry
+
+    def files(self) -> dict:
+        """
+        Returns:
+            Attachment path (as in the challenge details) -> local file, for the files that are downloaded
+        """
+        return self._cached("files", self.snapshot.path, self._files)
+
+    def _files(self) -> dict:
+        files = {}
+        for entry in self.snapshot.data.get("challenges", {}).values():
+            _chal = entry["data"]
+            chal_folder = challenge_folder(self.chals_folder, _chal.get("category", ""), _chal["name"])
+            for file in _chal.get("files", []):
+                path = file.split("?")[0]
+                local = os.path.join(chal_folder, os.path.basename(path))
+                if os.path.isfile(local):
+                    files[path] = local
+        return files
+
+class MirrorRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CTFd-CLI-Mirror"
+
+    def _json(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self) -> None:
+        self._json(404, {"success": False, "message": "Not found on the mirror"})
+
+    def do_GET(self):
+        if not self.server.authorized(self.headers.get("X-Mirror-Key")):
+            return self._json(401, {"success": False, "message": "Missing or wrong X-Mirror-Key"})
+
+        path = urlsplit(self.path).path.rstrip("/")
+        parts = path.split("/")
+
+        if path == "/api/v1/challenges":
+            return self._json(200, {"success": True, "data": self.server.challenges()})
+
+        if len(parts) == 5 and path.startswith("/api/v1/challenges/") and parts[4].isdigit():
+            if not (entry := self.server.challenge(parts[4])):
+                return self._not_found()
+            return self._json(200, {"success": True, "data": entry["data"], "updated": entry["updated"]})
+
+        self._file(path)
+
+    def do_HEAD(self):
+        if not self.server.authorized(self.headers.get("X-Mirror-Key")):
+            return self._json(401, {"success": False, "message": "Missing or wrong X-Mirror-Key"})
+
+        self._file(urlsplit(self.path).path.rstrip("/"), head=True)
+
+    def _file(self, path: str, head: bool = False) -> None:
+        if not path.startswith("/files/") or not (local := self.server.files().get(path)):
+            return self._not_found()
+
+        try:
+            fp = open(local, "rb")
+        except OSError:
+            # Removed since the listing was built
+            return self._not_found()
+        with fp:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(fp.fileno()).st_size))
+            self.end_headers()
+            if not head:
+                shutil.copyfileobj(fp, self.wfile, 1024 * 1024)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.info(f"{self.client_address[0]} {format % args}")
@@ -0,0 +1,189 @@
+class Model:
+    """
+    Base class for the models of the objects returned by the CTFd API.
+
+    Every model declares its fields in `__slots__` so that holding thousands of
+    challenges/solves doesn't carry a per-instance `__dict__` around.
+
+    Methods:
+        from_api: Builds the model from the `data` returned by the API
+        to_dict: Serializes the model back to a dict (for the config file)
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_api(cls, data: dict):
+        """
+        Builds the model from the raw dict returned by the CTFd API.
+        Unknown keys are ignored.
+        """
+        return cls(**{key: data[key] for key in cls.__slots__ if key in data})
+
+    def to_dict(self, skip: tuple = ()) -> dict:
+        """
+        Args:
+            skip: Fields that should not be serialized
+        Returns:
+            The model as a dict, fields that are set to None are dropped.
+        """
+        _ = {}
+        for key in self.__slots__:
+            if key in skip:
+                continue
+            value = getattr(self, key)
+            if value is None:
+                continue
+            _[key] = list(value) if isinstance(value, tuple) else value
+        return _
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{key}={getattr(self, key)!r}' for key in self.__slots__)})"
+
+class ChallengeModel(Model):
+    """
+    Simple model for the challenges deployed on the CTFd instance.
+
+    Attributes:
+        id: The id of the challenge
+        name: The name of the challenge
+        category: The category of the challenge
+        type: The type of the challenge
+        value: The points the challenge is worth
+        solves: Number of solves on the challenge
+        solved_by_me: Whether the challenge is solved by the user/team
+        tags: Tags attached to the challenge
+        is_downloaded: Whether the challenge is downloaded or not
+    """
+    __slots__ = ("id", "name", "category", "type", "value", "solves", "solved_by_me", "tags", "is_downloaded")
+
+    def __init__(self, id: int, name: str, category: str, type: str, value: int = 0, solves: int = 0,
+                 solved_by_me: bool = False, tags: tuple = (), is_downloaded: bool = False, **kwargs):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.type = type
+        self.value = value
+        self.solves = solves
+        self.solved_by_me = solved_by_me
+        # The API returns tags as [{"value": "..."}], the config stores them as plain strings.
+        self.tags = tuple(tag["value"] if isinstance(tag, dict) else tag for tag in (tags or ()))
+        self.is_downloaded = is_downloaded
+
+    def __str__(self):
+        return f"Challenge: {self.name} ({self.id})"
+
+    def __repr__(self):
+        return f"Challenge: {self.name} ({self.id})"
+
+    def to_dict(self, no_id: bool = False) -> dict:
+        return super().to_dict(skip=("id",) if no_id else ())
+
+class SolveModel(Model):
+    """
+    A single solve on a challenge (/api/v1/challenges/<id>/solves).
+
+    Attributes:
+        account_id: The id of the user/team that solved the challenge
+        name: The name of the user/team that solved the challenge
+        date: The date of the solve
+        account_url: The url of the user/team on the CTFd instance
+    """
+    __slots__ = ("account_id", "name", "date", "account_url")
+
+    def __init__(self, name: str, date: str, account_id: int = None, account_url: str = None, **kwargs):
+        self.account_id = account_id
+        self.name = name
+        self.date = date
+        self.account_url = account_url
+
+class ScoreboardEntryModel(Model):
+    """
+    A single entry of the scoreboard (/api/v1/scoreboard/top/<n>).
+
+    Attributes:
+        pos: The position of the user/team on the scoreboard
+        account_id: The id of the user/team
+        name: The name of the user/team
+        score: The score of the user/team
+        account_type: Either "user" or "team"
+    """
+    __slots__ = ("pos", "account_id", "name", "score", "account_type")
+
+    def __init__(self, pos: int, name: str, score: int, account_id: int = None, account_type: str = None, **kwargs):
+        self.pos = int(pos)
+        self.account_id = account_id
+        self.name = name
+        self.score = score
+        self.account_type = account_type
+
+    @classmethod
+    def from_api(cls, data: dict, pos: int = None):
+        """
+        The top/<n> endpoint returns the entries keyed by position with the id stored in `id`
+        whereas /api/v1/scoreboard returns a list with `pos` and `account_id`. Handles both.
+        """
+        return cls(
+            pos=data.get("pos", pos),
+            name=data["name"],
+            score=data["score"],
+            account_id=data.get("account_id", data.get("id")),
+            account_type=data.get("account_type")
+        )
+
+    @classmethod
+    def from_top(cls, data: dict) -> list:
+        """
+        Returns:
+            List of entries built from the response of /api/v1/scoreboard/top/<n>, sorted by position.
+        """
+        return sorted((cls.from_api(entry, pos=pos) for pos, entry in data.items()), key=lambda entry: entry.pos)
+
+class SubmissionModel(Model):
+    """
+    The result of a flag submission (/api/v1/challenges/attempt).
+
+    Attributes:
+        challenge_id: The id of the challenge the flag was submitted for
+        status: One of "correct", "incorrect", "already_solved", "paused", "ratelimited"
+        message: The message returned by the CTFd instance
+    """
+    __slots__ = ("challenge_id", "status", "message")
+
+    def __init__(self, status: str, message: str = "", challenge_id: int = None, **kwargs):
+        self.challenge_id = challenge_id
+        self.status = status
+        self.message = message
+
+class InstanceModel(Model):
+    """
+    The response of the containers plugin when starting/extending/stopping an instance.
+
+    Attributes:
+        status: The status returned by the plugin (e.g. "created", "already_running")
+        hostname: The hostname the instance is reachable on
+        port: The port the instance is reachable on
+        connect: The connection type of the instance ("http", "tcp", ...)
+        expires: The time the instance expires at
+        error: The error returned by the plugin, if any
+        success: The success message returned by the plugin, if any
+    """
+    __slots__ = ("status", "hostname", "port", "connect", "expires", "error", "success")
+
+    def __init__(self, status: str = None, hostname: str = None, port: int = None, connect: str = None,
+                 expires: int = None, error: str = None, success: str = None, **kwargs):
+        self.status = status
+        self.hostname = hostname
+        self.port = port
+        self.connect = connect
+        self.expires = expires
+        self.error = error
+        self.success = success
+
+    @property
+    def connection_string(self) -> str:
+        return f"http://{self.hostname}:{self.port}" if self.connect == "http" else f"nc {self.hostname} {self.port}"
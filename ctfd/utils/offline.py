@@ -0,0 +1,151 @@
+import os
+import json
+import time
+from datetime import datetime
+from .flags import UNCHECKED
+
+class Snapshot:
+    """
+    Local snapshot of everything read from the CTFd instance, used to serve the read
+    commands when running with --offline.
+
+    The snapshot is stored as {section: {key: {"data": ..., "updated": <timestamp>}}}.
+
+    Attributes:
+        path: Path to the snapshot file
+
+    Methods:
+        get: Returns the stored data and the time it was stored at
+        put: Stores the data, the file is written right away
+        put_many: Stores several entries with a single write
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path) as fp:
+                    self._data = json.load(fp)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def reload(self) -> None:
+        """
+        Drops the cached data so the next access reads the file again.
+        """
+        self._data = None
+
+    def get(self, section: str, key) -> tuple:
+        """
+        Returns:
+            (data, updated) if found, (None, None) otherwise
+        """
+        entry = self.data.get(section, {}).get(str(key))
+        if not entry:
+            return None, None
+        return entry["data"], entry["updated"]
+
+    def put(self, section: str, key, data, updated: float = None) -> None:
+        self.put_many(section, {key: data}, {key: updated} if updated else None)
+
+    def put_many(self, section: str, items: dict, updated: dict = None) -> None:
+        """
+        Stores several entries of a section with a single write of the file.
+
+        Args:
+            updated: key -> when the data was read from CTFd, for the entries not read just now
+        """
+        now = time.time()
+        for key, data in items.items():
+            self.data.setdefault(section, {})[str(key)] = {"data": data, "updated": (updated or {}).get(key) or now}
+
+        # Write to a temp file first so an interrupted write doesn't lose the whole snapshot.
+        _tmp = f"{self.path}.tmp"
+        with open(_tmp, "w") as fp:
+            json.dump(self.data, fp)
+        os.replace(_tmp, self.path)
+
+    @staticmethod
+    def age(updated: float) -> str:
+        return datetime.fromtimestamp(updated).strftime("%Y-%m-%d %H:%M:%S")
+
+class Outbox:
+    """
+    Durable queue of the flags submitted while offline. Every entry is appended as a JSON line
+    and fsync'd, so nothing is lost if the process dies. Entries are flushed in order.
+
+    The queued flags have to be submitted later, so unlike the ledger they're stored in plaintext
+    (whatever STORE_FLAGS says). Every entry is dropped from the file as soon as it's flushed, and
+    the file is removed once the queue is empty.
+
+    Attributes:
+        path: Path to the outbox file
+
+    Methods:
+        push: Queues a submission
+        entries: Returns the queued submissions, oldest first
+        flush: Submits the queued submissions in order
+        clear: Drops all the queued submissions
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def push(self, challenge_id: int, flag: str) -> None:
+        with open(self.path, "a") as fp:
+            fp.write(json.dumps({"challenge_id": challenge_id, "flag": flag, "queued": time.time()}) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def entries(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path) as fp:
+            return [json.loads(line) for line in fp if line.strip()]
+
+    def _rewrite(self, entries: list) -> None:
+        if not entries:
+            return self.clear()
+
+        _tmp = f"{self.path}.tmp"
+        with open(_tmp, "w") as fp:
+            fp.writelines(json.dumps(entry) + "\n" for entry in entries)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(_tmp, self.path)
+
+    def flush(self, submit) -> list:
+        """
+        Args:
+            submit: Called as submit(challenge_id, flag) for every queued entry, returns the API response
+        Returns:
+            List of (entry, response) for the flushed entries. Flushing stops at the first failure
+            and the remaining entries stay queued. Each entry is removed from the file right after
+            it's submitted, so an interrupted flush never submits it twice.
+        """
+        entries = self.entries()
+        flushed = []
+
+        for entry in entries:
+            try:
+                resp = submit(entry["challenge_id"], entry["flag"])
+            except Exception:
+                resp = None
+
+            # Paused and rate limited attempts are not processed by CTFd, keep them queued.
+            if not resp or resp.get("status") in UNCHECKED:
+                break
+            flushed.append((entry, resp))
+            self._rewrite(entries[len(flushed):])
+
+        return flushed
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+ORDERS = ("smallest", "category", "unsolved", "config")
+
+def estimate_sizes(ctfd, endpoints: list, max_workers: int = 16) -> dict:
+    """
+    Fetches the size of every attachment with concurrent HEAD requests (see `CTFd_Handler.get_file_size`).
+
+    Returns:
+        endpoint -> size in bytes, None when the server doesn't tell
+    """
+    endpoints = list(dict.fromkeys(endpoints))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(endpoints, pool.map(ctfd.get_file_size, endpoints)))
+
+class PlannedChallenge:
+    """
+    A challenge to download along with the size of its attachments.
+
+    Attributes:
+        challenge: The challenge (as stored in the configuration file)
+        files: [(endpoint, size)] of its attachments, size is None when unknown
+        size: Total size of the attachments, unknown sizes counted as 0
+        unknown: Number of attachments of unknown size
+    """
+    __slots__ = ("challenge", "files", "size", "unknown")
+
+    def __init__(self, challenge: dict, files: list):
+        self.challenge = challenge
+        self.files = files
+        self.size = sum(size or 0 for _, size in files)
+        self.unknown = sum(1 for _, size in files if size is None)
+
+def plan_downloads(challenges: list, details: dict, sizes: dict, order: str = "smallest") -> list:
+    """
+    Orders the downloads so the most challenges are playable as early as possible.
+
+    Args:
+        challenges: The challenges to download (as stored in the configuration file)
+        details: Challenge id -> details (as returned by the API), for the attachments
+        sizes: endpoint -> size (see `estimate_sizes`)
+        order: One of ORDERS
+            smallest: Smallest challenges first
+            category: Grouped by category, smallest first within a category
+            unsolved: Challenges not solved by the team first, smallest first
+            config: As listed in the configuration file
+    Returns:
+        List of `PlannedChallenge`, in the order they should be downloaded
+    """
+    plan = [
+        PlannedChallenge(chal, [(file, sizes.get(file)) for file in details.get(chal["id"], {}).get("files", [])])
+        for chal in challenges
+    ]
+
+    # Challenges with attachments of unknown size go after the ones of the same group we know about
+    smallest = lambda entry: (entry.unknown > 0, entry.size)
+    if order == "smallest":
+        plan.sort(key=smallest)
+    elif order == "category":
+        plan.sort(key=lambda entry: (entry.challenge.get("category", ""), *smallest(entry)))
+    elif order == "unsolved":
+        plan.sort(key=lambda entry: (bool(entry.challenge.get("solved_by_me")), *smallest(entry)))
+    return plan
@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .logger import logger
+
+# Fields of the challenge list that, when changed, mean the cached details are stale
+FIELDS = ("name", "category", "type", "value")
+
+# The /files/...?token= links of the details expire after an hour on CTFd
+MAX_AGE = 3600
+
+def is_stale(listing: dict, details: dict, updated: float = None) -> bool:
+    if not details or (updated is not None and time.time() - updated > MAX_AGE):
+        return True
+    return any(listing.get(field) != details.get(field) for field in FIELDS)
+
+def _fetch(ctfd, listing: dict, cached: dict, updated: float, force: bool) -> tuple:
+    """
+    Returns:
+        (details, changed, updated): the details of the challenge with the content of its unlocked
+        hints, and when they were read from CTFd (the team mirror may have had them for a while)
+    """
+    changed = force or is_stale(listing, cached, updated)
+    details, updated = ctfd.fetch_challenge(listing["id"]) if changed else (cached, updated)
+    if not details:
+        return None, False, None
+
+    for hint in details.get("hints", []):
+        # Locked hints only have their id and cost, they're checked again on every run since
+        # they may have been unlocked from the web UI in the meantime.
+        if not isinstance(hint, dict) or hint.get("content") or "id" not in hint:
+            continue
+        if content := ctfd.get_hint(hint["id"]).get("content"):
+            hint["content"] = content
+            changed = True
+
+    return details, changed, updated
+
+def prefetch(ctfd, challenges: list, snapshot, force: bool = False, max_workers: int = 8) -> dict:
+    """
+    Fetches the details and unlocked hints of the challenges concurrently into the snapshot,
+    so downloading or reading a challenge doesn't need a round trip to CTFd.
+
+    Only the challenges whose name, category, type or value changed since they were cached, or
+    that were cached over an hour ago (their file links have expired), are fetched again (all of
+    them with `force`), the snapshot is written once at the end.
+
+    Args:
+        ctfd: The `CTFd_Handler` to fetch with
+        challenges: The challenges (as stored in the configuration file)
+        snapshot: The workspace snapshot
+    Returns:
+        The challenges that changed (id -> details) and the number of "fetched", "cached" and "failed" ones
+    """
+    cached = {chal["id"]: snapshot.get("challenges", chal["id"]) for chal in challenges}
+    changed, updated, stats = {}, {}, {"fetched": 0, "cached": 0, "failed": 0}
+
+    def task(chal: dict) -> tuple:
+        try:
+            return _fetch(ctfd, chal, *cached[chal["id"]], force)
+        except Exception as E:
+            logger.error(f"Could not prefetch {chal['name']}: {E.__str__()}")
+            return None, False, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for chal, (details, _changed, _updated) in zip(challenges, pool.map(task, challenges)):
+            if details is None:
+                stats["failed"] += 1
+                continue
+            stats["cached" if details is cached[chal["id"]][0] else "fetched"] += 1
+            if _changed:
+                changed[chal["id"]], updated[chal["id"]] = details, _updated
+
+    if changed:
+        snapshot.put_many("challenges", changed, updated)
+    return {"changed": changed, **stats}
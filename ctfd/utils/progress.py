@@ -0,0 +1,123 @@
+import sys
+import time
+import threading
+
+def human_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+def human_time(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02}:{seconds % 60:02}" if seconds >= 3600 else f"{seconds // 60}:{seconds % 60:02}"
+
+class Task:
+    """
+    A single download tracked by `Progress`.
+
+    Attributes:
+        name: Name shown in the progress line
+        total: Total size in bytes (None if unknown)
+        done: Bytes downloaded so far
+        started: The time the download started at
+    """
+    __slots__ = ("name", "total", "done", "started")
+
+    def __init__(self, name: str, total: int = None):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+
+class Progress:
+    """
+    Shared progress renderer for all the downloads of a run.
+
+    Updates are cheap (a counter increment), the line itself is redrawn at most once every
+    `interval` seconds and shows the per-file and the aggregate throughput/ETA. Nothing is
+    drawn when the stream isn't a TTY.
+
+    Attributes:
+        stream: The stream to draw on
+        interval: Minimum time between two redraws, in seconds
+        enabled: Whether anything is drawn at all
+
+    Methods:
+        add: Starts tracking a download
+        update: Adds the downloaded bytes to a download
+        finish: Stops tracking a download
+    """
+
+    def __init__(self, stream = None, interval: float = 0.1, enabled: bool = None):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.enabled = self.stream.isatty() if enabled is None else enabled
+
+        self._lock = threading.Lock()
+        self._tasks = []
+        self._last_draw = 0.0
+        self._started = None
+        self._done = 0
+        self._total = 0
+        self._finished = 0
+        self._count = 0
+
+    def add(self, name: str, total: int = None) -> Task:
+        task = Task(name, total)
+        with self._lock:
+            if not self._tasks and self._started is None:
+                self._started = task.started
+            self._tasks.append(task)
+            self._total += total or 0
+            self._count += 1
+        return task
+
+    def update(self, task: Task, n: int) -> None:
+        with self._lock:
+            task.done += n
+            self._done += n
+            if not self.enabled:
+                return
+
+            now = time.monotonic()
+            if now - self._last_draw < self.interval:
+                return
+            self._last_draw = now
+            self._draw(now)
+
+    def finish(self, task: Task) -> None:
+        with self._lock:
+            if task in self._tasks:
+                self._tasks.remove(task)
+            self._finished += 1
+            if self.enabled:
+                # Clear the line so the next log message starts on a clean line.
+                self.stream.write("\r\x1b[2K")
+                self.stream.flush()
+                self._last_draw = 0.0
+
+    def _draw(self, now: float) -> None:
+        parts = []
+        for task in self._tasks[:2]:
+            rate = task.done / max(now - task.started, 1e-6)
+            if task.total:
+                eta = (task.total - task.done) / rate if rate else 0
+                parts.append(f"{task.name}: {human_size(task.done)}/{human_size(task.total)} ({human_size(rate)}/s, ETA {human_time(eta)})")
+            else:
+                parts.append(f"{task.name}: {human_size(task.done)} ({human_size(rate)}/s)")
+        if len(self._tasks) > 2:
+            parts.append(f"+{len(self._tasks) - 2} more")
+
+        rate = self._done / max(now - self._started, 1e-6)
+        _total = f"{self._finished}/{self._count} files, {human_size(self._done)}"
+        if self._total:
+            _total += f"/{human_size(self._total)}"
+        _total += f" ({human_size(rate)}/s"
+        if self._total and rate and self._total > self._done:
+            _total += f", ETA {human_time((self._total - self._done) / rate)}"
+        parts.append(f"total {_total})")
+
+        self.stream.write(f"\r\x1b[2K[\x1b[32;20mDOWNLOADING\x1b[0m] {' | '.join(parts)}")
+        self.stream.flush()
@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+
+TOKEN = re.compile(r"[a-z0-9_]+")
+
+# How much a match in each field counts, a match in the name is worth more than one in the description.
+FIELD_WEIGHTS = {
+    "name": 3,
+    "category": 2,
+    "tags": 2,
+    "files": 2,
+    "hints": 1,
+    "description": 1,
+}
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall(text.lower())
+
+class SearchIndex:
+    """
+    Inverted index over the downloaded challenges, stored as a single JSON file in the workspace.
+    Challenges are (re)indexed one at a time as they're downloaded and queries are ranked with BM25.
+
+    Attributes:
+        path: Path to the index file
+
+    Methods:
+        add: Indexes (or reindexes) a challenge
+        remove: Drops a challenge from the index
+        save: Writes the index to disk
+        search: Returns the challenges matching the query, best first
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = None
+        self._dirty = False
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path) as fp:
+                    self._data = json.load(fp)
+            except (OSError, ValueError):
+                self._data = {"docs": {}, "postings": {}}
+        return self._data
+
+    def __len__(self):
+        return len(self.data["docs"])
+
+    def remove(self, doc_id) -> None:
+        doc_id = str(doc_id)
+        if not (doc := self.data["docs"].pop(doc_id, None)):
+            return
+
+        postings = self.data["postings"]
+        for term in doc["terms"]:
+            postings[term].pop(doc_id, None)
+            if not postings[term]:
+                del postings[term]
+        self._dirty = True
+
+    def add(self, doc_id, fields: dict, meta: dict) -> None:
+        """
+        Args:
+            doc_id: Unique id of the document (the challenge id)
+            fields: field -> text, see FIELD_WEIGHTS for the fields that are indexed
+            meta: Returned as is with the search results
+        """
+        doc_id = str(doc_id)
+        self.remove(doc_id)
+
+        terms = Counter()
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1)
+            for term in tokenize(text or ""):
+                terms[term] += weight
+
+        postings = self.data["postings"]
+        for term, tf in terms.items():
+            postings.setdefault(term, {})[doc_id] = tf
+
+        self.data["docs"][doc_id] = {"meta": meta, "length": sum(terms.values()), "terms": list(terms)}
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+
+        _tmp = f"{self.path}.tmp"
+        with open(_tmp, "w") as fp:
+            json.dump(self.data, fp)
+        os.replace(_tmp, self.path)
+        self._dirty = False
+
+    def _expand(self, term: str) -> list:
+        # Exact term if indexed, otherwise every indexed term it's a prefix of (e.g. "deser" -> "deserialization")
+        postings = self.data["postings"]
+        if term in postings:
+            return [term]
+        return [_term for _term in postings if _term.startswith(term)]
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Returns:
+            List of (score, meta) for the best matching documents, best first
+        """
+        docs, postings = self.data["docs"], self.data["postings"]
+        if not docs:
+            return []
+
+        n = len(docs)
+        avg_length = sum(doc["length"] for doc in docs.values()) / n
+        scores = Counter()
+
+        for term in set(tokenize(query)):
+            for _term in self._expand(term):
+                matches = postings[_term]
+                idf = math.log(1 + (n - len(matches) + 0.5) / (len(matches) + 0.5))
+                for doc_id, tf in matches.items():
+                    norm = self.k1 * (1 - self.b + self.b * docs[doc_id]["length"] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return [(score, docs[doc_id]["meta"]) for doc_id, score in scores.most_common(limit)]
+
+def find_indexes(root: str, name: str = "index.json") -> list:
+    """
+    Returns:
+        The paths of all the workspace indexes (`.ctfd/<name>`) under `root`. The challenge folders of
+        a workspace are never walked, only its `.ctfd` folder.
+    """
+    indexes = []
+    for current, dirs, files in os.walk(root):
+        if os.path.basename(current) == ".ctfd":
+            if name in files:
+                indexes.append(os.path.join(current, name))
+            dirs[:] = []
+            continue
+        if ".ctfd" in dirs:
+            dirs[:] = [".ctfd"]
+            continue
+        # Only descend into the workspace folders and challenge categories, not into other hidden folders.
+        dirs[:] = [_dir for _dir in dirs if _dir == ".ctfd" or not _dir.startswith(".")]
+    return indexes
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from .logger import logger
+from .ctfd import CTFd_Handler
+
+DEFAULT_TARGET = "default"
+
+def get_targets(config: dict) -> dict:
+    """
+    Returns all the CTFd instances defined in the workspace, keyed by their label.
+    The instance stored under "CTFD" is always available as `default`.
+    """
+    targets = {}
+    if ctfd := config.get("CTFD", {}):
+        targets[DEFAULT_TARGET] = ctfd
+    targets.update(config.get("Targets", {}))
+    return targets
+
+class MultiCTFd_Handler:
+    """
+    Runs the same `CTFd_Handler` operation against several CTFd instances concurrently.
+
+    Attributes:
+        targets: The targets to operate on, label -> {"URL": ..., "TOKEN": ...}
+        skip: Skip checking connection to the CTFd instances
+
+    Methods:
+        run: Calls the given `CTFd_Handler` method on every target and returns the results per label
+    """
+
+    def __init__(self, targets: dict, skip: bool = False, max_workers: int = 8):
+        self.targets = targets
+        self.skip = skip
+        self.max_workers = max_workers
+        self._handlers = {}
+
+    def _handler(self, label: str) -> CTFd_Handler:
+        if label not in self._handlers:
+            target = self.targets[label]
+            self._handlers[label] = CTFd_Handler(target.get("URL", ""), target.get("TOKEN", ""), self.skip)
+        return self._handlers[label]
+
+    def _call(self, label: str, method: str, *args, **kwargs):
+        try:
+            return getattr(self._handler(label), method)(*args, **kwargs)
+        except SystemExit:
+            # CTFd() exits when an instance is down, that shouldn't take down the other targets.
+            logger.error(f"[{label}] CTFd instance is not reachable, skipping.")
+        except Exception as E:
+            logger.error(f"[{label}] {method} failed: {E.__str__()}")
+        return None
+
+    def run(self, method: str, *args, **kwargs) -> dict:
+        """
+        Args:
+            method: Name of the `CTFd_Handler` method to call
+            *args, **kwargs: Passed as is to the method
+        Returns:
+            label -> result, in the same order as the targets. Targets that failed map to None.
+        """
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.targets)) or 1) as pool:
+            futures = {label: pool.submit(self._call, label, method, *args, **kwargs) for label in self.targets}
+            return {label: future.result() for label, future in futures.items()}
@@ -0,0 +1,282 @@
+import os
+import sys
+import time
+import struct
+from array import array
+
+# Record headers, everything on disk is little-endian
+TEAM = struct.Struct("<cIqH")      # b"T", index, account id (-1 if unknown), length of the name
+SAMPLE = struct.Struct("<cdI")     # b"S", time, number of teams whose score changed
+
+def _pack(typecode: str, values) -> bytes:
+    _ = array(typecode, values)
+    if sys.byteorder == "big":
+        _.byteswap()
+    return _.tobytes()
+
+def _unpack(typecode: str, data: bytes) -> array:
+    _ = array(typecode)
+    _.frombytes(data)
+    if sys.byteorder == "big":
+        _.byteswap()
+    return _
+
+class ScoreSeries:
+    """
+    Append-only time series of a scoreboard, compact enough to sample a board of thousands of
+    teams every minute for a whole CTF.
+
+    Teams are interned once (account id + name -> index) and every sample only stores the teams
+    whose score changed since the previous sample, as two packed arrays: their indexes (u32) and
+    the score deltas (i32). A sample where nothing moved costs 13 bytes.
+
+    Ranks aren't stored, they're derived from the scores with ties going to the team that reached
+    its score first (the way CTFd breaks them).
+
+    File format:
+        T <index> <account id> <name length> <name>: Interns a team (or renames it)
+        S <time> <count> <indexes[count]> <deltas[count]>: A sample
+
+    Attributes:
+        path: Path to the series file
+        teams: Index -> [account id, name]
+        scores: Index -> latest score
+        samples: Number of samples recorded
+        first, last: Time of the first and latest samples
+
+    Methods:
+        record: Appends a sample of the scoreboard
+        find: Returns the index of a team from its name or account id
+        trajectory: Score and rank of a team after every sample that moved it
+        rank_changes: Rank of every team at the start and end of a window
+    """
+
+    def __init__(self, path: str, repair: bool = False):
+        """
+        Args:
+            path: Path to the series file
+            repair: Drop the half-written record of an interrupted run. Only the recorder should
+                do it, for the readers that record may still be in the middle of being appended.
+        """
+        self._reset(path)
+
+        if os.path.exists(path) and (offset := self._replay()) != os.path.getsize(path) and repair:
+            with open(path, "r+b") as fp:
+                fp.truncate(offset)
+
+    def _reset(self, path: str) -> None:
+        self.path = path
+        self.teams = []
+        self.scores = array("q")
+        self._changed = array("d")
+        self._ids = {}
+        self.samples = 0
+        self.first = self.last = None
+
+    def _empty(self) -> "ScoreSeries":
+        """
+        Returns:
+            A series on the same file that hasn't been replayed, used by the queries to walk the samples
+        """
+        series = ScoreSeries.__new__(ScoreSeries)
+        series._reset(self.path)
+        return series
+
+    @staticmethod
+    def _key(account_id, name: str):
+        return account_id if account_id is not None else name
+
+    def _intern(self, index: int, account_id: int, name: str) -> None:
+        if index == len(self.teams):
+            self.teams.append([account_id, name])
+            self.scores.append(0)
+            self._changed.append(0)
+        else:
+            self.teams[index][1] = name
+        self._ids[self._key(account_id, name)] = index
+
+    def _apply(self, when: float, indexes, deltas) -> None:
+        for index, delta in zip(indexes, deltas):
+            self.scores[index] += delta
+            self._changed[index] = when
+        self.samples += 1
+        self.first = when if self.first is None else self.first
+        self.last = when
+
+    def _records(self):
+        """
+        Yields ("T", (index, account id, name)) and ("S", (time, indexes, deltas)) for every complete
+        record of the file, then ("end", offset of the last complete record).
+        """
+        with open(self.path, "rb") as fp:
+            data = fp.read()
+
+        offset = 0
+        while offset < len(data):
+            tag = data[offset:offset + 1]
+            if tag == b"T" and offset + TEAM.size <= len(data):
+                _, index, account_id, length = TEAM.unpack_from(data, offset)
+                end = offset + TEAM.size + length
+                if end > len(data):
+                    break
+                name = data[offset + TEAM.size:end].decode()
+                yield "T", (index, None if account_id < 0 else account_id, name)
+            elif tag == b"S" and offset + SAMPLE.size <= len(data):
+                _, when, count = SAMPLE.unpack_from(data, offset)
+                start = offset + SAMPLE.size
+                end = start + count * 8
+                if end > len(data):
+                    break
+                yield "S", (when, _unpack("I", data[start:start + count * 4]), _unpack("i", data[start + count * 4:end]))
+            else:
+                break
+            offset = end
+        yield "end", offset
+
+    def _replay(self, before_sample = None, after_sample = None) -> int:
+        """
+        Rebuilds the state from the file, calling `before_sample(time)` and `after_sample(time)`
+        around every sample.
+
+        Returns:
+            The offset of the end of the last complete record
+        """
+        for kind, record in self._records():
+            if kind == "T":
+                self._intern(*record)
+            elif kind == "S":
+                if before_sample:
+                    before_sample(record[0])
+                self._apply(*record)
+                if after_sample:
+                    after_sample(record[0])
+            else:
+                return record
+        return 0
+
+    def record(self, entries: list, when: float = None) -> int:
+        """
+        Appends a sample of the scoreboard, written with a single write.
+
+        Args:
+            entries: The scoreboard (`ScoreboardEntryModel`s)
+            when: Time of the sample, now by default
+        Returns:
+            The number of teams whose score changed
+        """
+        when = time.time() if when is None else when
+        data = bytearray()
+        indexes, deltas = [], []
+
+        for entry in entries:
+            key = self._key(entry.account_id, entry.name)
+            if (index := self._ids.get(key)) is None or self.teams[index][1] != entry.name:
+                index = len(self.teams) if index is None else index
+                name = entry.name.encode()
+                account_id = -1 if entry.account_id is None else int(entry.account_id)
+                data += TEAM.pack(b"T", index, account_id, len(name)) + name
+                self._intern(index, entry.account_id, entry.name)
+
+            if delta := int(entry.score or 0) - self.scores[index]:
+                indexes.append(index)
+                deltas.append(delta)
+
+        data += SAMPLE.pack(b"S", when, len(indexes)) + _pack("I", indexes) + _pack("i", deltas)
+        with open(self.path, "ab") as fp:
+            fp.write(data)
+
+        self._apply(when, indexes, deltas)
+        return len(indexes)
+
+    def find(self, team: str) -> int:
+        """
+        Returns:
+            The index of the team with the given name or account id, None if it was never recorded
+        """
+        if str(team).isdigit() and (index := self._ids.get(int(team))) is not None:
+            return index
+        for index, (_, name) in enumerate(self.teams):
+            if name == team:
+                return index
+        return None
+
+    def _ranks(self) -> list:
+        """
+        Returns:
+            Index -> rank of every team with the current scores
+        """
+        order = sorted(range(len(self.teams)), key=lambda i: (-self.scores[i], self._changed[i], i))
+        ranks = [0] * len(order)
+        for rank, index in enumerate(order, start=1):
+            ranks[index] = rank
+        return ranks
+
+    def _rank(self, index: int) -> int:
+        # A single rank is a linear scan, cheaper than sorting the whole board on every sample.
+        score, key = self.scores[index], (self._changed[index], index)
+        scores, changed = self.scores, self._changed
+        return 1 + sum(1 for i in range(len(scores)) if scores[i] > score or (scores[i] == score and (changed[i], i) < key))
+
+    def trajectory(self, index: int, since: float = None) -> list:
+        """
+        Args:
+            index: The team (see `find`)
+            since: Start of the window, the whole series by default
+        Returns:
+            [(time, score, rank)] after every sample that changed the score or the rank of the team
+        """
+        series = self._empty()
+        points = []
+
+        def after_sample(when: float) -> None:
+            if index >= len(series.teams) or (since is not None and when < since):
+                return
+            point = (when, series.scores[index], series._rank(index))
+            if not points or points[-1][1:] != point[1:]:
+                points.append(point)
+
+        series._replay(after_sample=after_sample)
+        return points
+
+    def rank_changes(self, since: float = None) -> list:
+        """
+        Compares the board right before the window with the latest sample.
+
+        Args:
+            since: Start of the window, the whole series by default
+        Returns:
+            [(name, rank before, rank after, score before, score after)] of every team, biggest climbers
+            first. The rank and score before are None for the teams that showed up during the window.
+            Empty if no sample was recorded during the window.
+        """
+        if since is not None and (self.last is None or self.last < since):
+            return []
+
+        series = self._empty()
+        start = {}
+
+        def capture(by: str) -> None:
+            start.update(by=by, ranks=series._ranks(), scores=list(series.scores))
+
+        def before_sample(when: float) -> None:
+            # The state after the last sample before the window
+            if since is not None and when >= since and series.samples and start.get("by") != "window":
+                capture("window")
+
+        def after_sample(when: float) -> None:
+            # Unless the window starts with the recording, then it's the first sample
+            if series.samples == 1:
+                capture("first")
+
+        series._replay(before_sample, after_sample)
+        if not start:
+            return []
+
+        ranks, known = series._ranks(), len(start["ranks"])
+        changes = []
+        for index, (_, name) in enumerate(series.teams):
+            before = start["ranks"][index] if index < known else None
+            score = start["scores"][index] if index < known else None
+            changes.append((name, before, ranks[index], score, series.scores[index]))
+
+        return sorted(changes, key=lambda change: (-((change[1] or len(ranks) + 1) - change[2]), change[2]))
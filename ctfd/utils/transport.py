@@ -0,0 +1,146 @@
+import requests
+from requests.adapters import HTTPAdapter
+from .logger import logger
+
+# Every download segment, prefetch and HEAD worker can hold a connection at the same time
+POOL_SIZE = 32
+
+class Transport:
+    """
+    Base class for the transports used to talk to CTFd (see `RequestHandler.get_transport`).
+
+    Both return responses with the `requests` interface (`status_code`, `headers`, `url`, `json()`,
+    `text`, `iter_content()`, `raise_for_status()`) and raise `requests.RequestException`, so the
+    callers don't need to know which one is used.
+
+    Methods:
+        request: Makes the request and returns the response, read entirely
+        stream: Makes the request and returns the response without reading its body, to be used with `with`
+    """
+    name = None
+
+    def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        raise NotImplementedError
+
+    def stream(self, method: str, url: str, headers: dict = None, **kwargs):
+        raise NotImplementedError
+
+class RequestsTransport(Transport):
+    """
+    HTTP/1.1 transport using `requests`. A single session is kept so connections are reused.
+    """
+    name = "requests"
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def stream(self, method: str, url: str, headers: dict = None, **kwargs):
+        return self.session.request(method, url, headers=headers, stream=True, **kwargs)
+
+class HTTP2Response:
+    """
+    Wraps an `httpx` response in the subset of the `requests.Response` interface the CLI uses.
+    """
+
+    def __init__(self, response, context = None):
+        self._response = response
+        self._context = context
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    @property
+    def content(self) -> bytes:
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def iter_content(self, chunk_size: int = None):
+        import httpx
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.HTTPError as E:
+            raise requests.ConnectionError(E.__str__()) from E
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self) -> None:
+        if self._context is not None:
+            self._context.__exit__(None, None, None)
+            self._context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class HTTP2Transport(Transport):
+    """
+    HTTP/2 transport using `httpx`. Every request made to the same host, including the ones made
+    concurrently from several threads (download segments, prefetch, HEAD requests), is multiplexed
+    over a single connection.
+
+    Requires the optional `httpx[http2]` dependency (pip install ctfd-cli[http2]).
+    """
+    name = "http2"
+
+    def __init__(self):
+        import httpx
+        self.httpx = httpx
+        self.client = httpx.Client(http2=True, follow_redirects=True, timeout=30,
+                                   limits=httpx.Limits(max_connections=POOL_SIZE))
+
+    def _kwargs(self, kwargs: dict) -> dict:
+        # Redirects are always followed, `requests`' (connect, read) timeouts are mapped as is.
+        kwargs.pop("stream", None)
+        kwargs.pop("allow_redirects", None)
+        if isinstance(timeout := kwargs.get("timeout"), tuple):
+            kwargs["timeout"] = self.httpx.Timeout(timeout[1], connect=timeout[0])
+        return kwargs
+
+    def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        try:
+            return HTTP2Response(self.client.request(method, url, headers=headers, **self._kwargs(kwargs)))
+        except self.httpx.HTTPError as E:
+            raise requests.ConnectionError(E.__str__()) from E
+
+    def stream(self, method: str, url: str, headers: dict = None, **kwargs):
+        context = self.client.stream(method, url, headers=headers, **self._kwargs(kwargs))
+        try:
+            return HTTP2Response(context.__enter__(), context)
+        except self.httpx.HTTPError as E:
+            raise requests.ConnectionError(E.__str__()) from E
+
+TRANSPORTS = {transport.name: transport for transport in (RequestsTransport, HTTP2Transport)}
+
+def get_transport(name: str = None) -> Transport:
+    """
+    Returns:
+        The transport with the given name, `requests` if it's not set or can't be used
+    """
+    if not name or name == RequestsTransport.name:
+        return RequestsTransport()
+
+    if name not in TRANSPORTS:
+        logger.warning(f"Unknown transport \"{name}\", using requests.")
+        return RequestsTransport()
+
+    try:
+        return TRANSPORTS[name]()
+    except ImportError:
+        logger.warning(f"The {name} transport needs httpx[http2] (pip install 'httpx[http2]'), using requests.")
+        return RequestsTransport()
@@ -28,12 +28,8 @@ def fix_url(url: str) -> str:
 
 def get_config(_config_path: str) -> dict:
 
-    if not os.path.exists(_config_path) and not os.path.exists("/tmp/.ctfd.cache"):
+    if not _config_path:
         return {}
-    
-    if os.path.exists("/tmp/.ctfd.cache") and not os.path.exists(_config_path):
-        with open("/tmp/.ctfd.cache") as f:
-            _config_path = os.path.join(f.read().strip(), "config.json")
 
     try:
         with open(_config_path) as fp:
@@ -69,6 +65,16 @@ def update_challenge(_config: str, _id: int, _key: str, _value: str) -> None:
 
     write_config("Challenges", _, _config, mode="a")
 
+def update_target(_config: str, _label: str, _key: str, _value) -> None:
+    _ = get_config(_config)
+
+    _ = _.get("Targets", {})
+    if _label not in _:
+        return
+
+    _[_label][_key] = _value
+    write_config("Targets", _, _config, mode="a")
+
 def update_template(_src: str, _dst: str, _id: int, _config: str) -> None:
 
     """
@@ -0,0 +1,88 @@
+import os
+import hashlib
+from functools import lru_cache
+
+CONFIG_DIR = ".ctfd"
+CONFIG_FILE = "config.json"
+
+class Workspace:
+    """
+    A CTF workspace, i.e. the challenges folder that contains the `.ctfd` config directory.
+
+    Attributes:
+        root: The challenges folder (parent of the config directory)
+        config_dir: The `.ctfd` directory
+        config: Path to the `config.json` inside the config directory
+        cache_dir: Per-user cache directory for this workspace (under $XDG_CACHE_HOME)
+
+    Methods:
+        resolve: Finds the workspace for the current working directory
+        from_config_dir: Builds the workspace from an explicit config directory
+    """
+    __slots__ = ("root", "config_dir", "config", "cache_dir")
+
+    def __init__(self, config_dir: str):
+        self.config_dir = os.path.abspath(config_dir)
+        self.root = os.path.dirname(self.config_dir)
+        self.config = os.path.join(self.config_dir, CONFIG_FILE)
+        self.cache_dir = os.path.join(_xdg_cache_home(), "ctfd", _workspace_key(self.config_dir))
+
+    def __repr__(self):
+        return f"Workspace({self.root})"
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.config)
+
+    def state_path(self, name: str, per_user: bool = False) -> str:
+        """
+        Args:
+            name: Name of the state file
+            per_user: Store it in the per-user cache instead of the shared `.ctfd` folder
+        Returns:
+            Path to the state file. The per-user cache directory is created if missing,
+            the `.ctfd` folder is only ever created by `ctfd init`.
+        """
+        if not per_user:
+            return os.path.join(self.config_dir, name)
+
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        return os.path.join(self.cache_dir, name)
+
+    @staticmethod
+    def from_config_dir(config_dir: str) -> "Workspace":
+        return Workspace(config_dir)
+
+    @staticmethod
+    def resolve(start: str = None, dir_name: str = "challenges") -> "Workspace":
+        """
+        Walks up from `start` (defaults to cwd) looking for a `.ctfd` folder, either directly
+        in a directory or inside its `dir_name` subfolder (the layout `ctfd init` creates).
+
+        The result is cached for the lifetime of the process so the walk happens only once
+        no matter how many times the config is looked up.
+
+        Returns:
+            The workspace if one was found, None otherwise.
+        """
+        return _resolve(os.path.abspath(start or os.getcwd()), dir_name)
+
+@lru_cache(maxsize=None)
+def _resolve(start: str, dir_name: str) -> Workspace:
+    current = start
+    while True:
+        for candidate in (os.path.join(current, CONFIG_DIR), os.path.join(current, dir_name, CONFIG_DIR)):
+            if os.path.isfile(os.path.join(candidate, CONFIG_FILE)):
+                return Workspace(candidate)
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+def _xdg_cache_home() -> str:
+    return os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+
+def _workspace_key(config_dir: str) -> str:
+    # Readable prefix so the user can tell the workspaces apart, hash so two CTFs with the same folder name don't collide
+    _name = os.path.basename(os.path.dirname(os.path.dirname(config_dir))) or "root"
+    return f"{_name}-{hashlib.sha1(config_dir.encode()).hexdigest()[:12]}"
@@ -16,6 +16,9 @@ setup(
         "argparse",
         "tabulate"
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],  # HTTP/2 transport (--transport http2)
+    },
     entry_points={
         'console_scripts': [
             'ctfd=ctfd.ctfd:main',  # This exposes `ctfd.py` as the `ctfd` command
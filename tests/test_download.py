@@ -0,0 +1,107 @@
+import os
+import re
+import time
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from ctfd.utils import CTFd_Handler, Progress
+from ctfd.utils.download import download_segmented, split_ranges
+
+DATA = os.urandom(3 * 1024 * 1024 + 123)
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves DATA with byte range support. The server's `mode` makes the ranges misbehave:
+        ok: Every range is answered with a 206
+        no-range: Ranges are answered with a 200 and the whole file (the segmented download must fail)
+        fail-first: The first range fails right away, the others are served slowly
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("Range"))
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range") or "")
+        mode = self.server.mode
+
+        if not match or mode == "no-range":
+            return self._send(200, DATA)
+
+        start, end = int(match[1]), int(match[2])
+        if mode == "fail-first" and start == 0:
+            return self._send(500, b"")
+        self._send(206, DATA[start:end + 1], slow=mode == "fail-first", content_range=f"bytes {start}-{end}/{len(DATA)}")
+
+    def _send(self, status: int, body: bytes, slow: bool = False, content_range: str = None):
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+        try:
+            for offset in range(0, len(body), 65536):
+                self.wfile.write(body[offset:offset + 65536])
+                if slow:
+                    time.sleep(0.1)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+class SegmentedDownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        self.server.daemon_threads = True
+        self.server.mode = "ok"
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "file.bin")
+        self.handler = CTFd_Handler(self.url, "token", skip=True, progress=Progress(enabled=False), segments=4, segment_threshold=1024)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def assertDownloaded(self):
+        with open(self.filename, "rb") as fp:
+            self.assertEqual(hashlib.sha256(fp.read()).hexdigest(), hashlib.sha256(DATA).hexdigest())
+
+    def test_split_ranges(self):
+        ranges = split_ranges(10, 3)
+        self.assertEqual(ranges, [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(split_ranges(2, 4), [(0, 0), (1, 1)])
+
+    def test_segmented(self):
+        self.handler.download_file("/files/file.bin", self.filename)
+        self.assertDownloaded()
+        self.assertEqual(len([r for r in self.server.requests if r]), 4)
+
+    def test_fallback_to_single_stream(self):
+        self.server.mode = "no-range"
+        self.handler.download_file("/files/file.bin", self.filename)
+        self.assertDownloaded()
+        # The probe, the failed ranges, then a single stream without a Range header
+        self.assertIsNone(self.server.requests[-1])
+
+    def test_failed_segment_stops_the_others(self):
+        self.server.mode = "fail-first"
+        progress = Progress(enabled=False)
+        task = progress.add("file.bin", len(DATA))
+
+        started = time.monotonic()
+        with self.assertRaises(Exception):
+            download_segmented(f"{self.url}/files/file.bin", self.filename, len(DATA), 4, progress, task)
+
+        # Serving the slow segments entirely takes over a second
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertFalse(os.path.exists(self.filename))
+
+if __name__ == "__main__":
+    unittest.main()
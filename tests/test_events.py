@@ -0,0 +1,64 @@
+import unittest
+
+from ctfd.utils import EventParser
+
+STREAM = (
+    b": keep-alive\r\n"
+    b"retry: 5000\r\n"
+    b"\r\n"
+    b"id: 1\r\n"
+    b"event: notification\r\n"
+    b"data: {\"title\": \"Hello\",\r\n"
+    b"data:  \"content\": \"world\"}\r\n"
+    b"\r\n"
+    b"id: 2\n"
+    b"data: plain\n"
+    b"\n"
+)
+
+class EventParserTest(unittest.TestCase):
+
+    def assertEvents(self, events: list):
+        self.assertEqual([(event.id, event.event, event.data) for event in events], [
+            ("1", "notification", "{\"title\": \"Hello\",\n \"content\": \"world\"}"),
+            ("2", "message", "plain")
+        ])
+        self.assertEqual(events[0].json(), {"title": "Hello", "content": "world"})
+
+    def test_whole_stream(self):
+        parser = EventParser()
+        self.assertEvents(parser.feed(STREAM))
+        self.assertEqual(parser.retry, 5000)
+        self.assertEqual(parser.last_id, "2")
+
+    def test_split_chunks(self):
+        # Every possible split, including between \r and \n and inside multi-byte characters
+        for size in (1, 2, 3, 7, 64):
+            parser = EventParser()
+            events = []
+            for offset in range(0, len(STREAM), size):
+                events += parser.feed(STREAM[offset:offset + size])
+            self.assertEvents(events)
+
+    def test_incomplete_event(self):
+        parser = EventParser()
+        self.assertEqual(parser.feed(b"id: 3\r\ndata: pending\r\n"), [])
+        events = parser.feed(b"\r\n")
+        self.assertEqual([(event.id, event.data) for event in events], [("3", "pending")])
+
+    def test_last_event_id(self):
+        # The id is kept for the events that don't send one, and survives reconnecting.
+        parser = EventParser(last_id="41")
+        self.assertEqual(parser.feed(b"data: a\n\n")[0].id, "41")
+        self.assertEqual(parser.feed(b"id: 42\ndata: b\n\ndata: c\n\n")[-1].id, "42")
+        self.assertEqual(parser.feed(b"id\n\n"), [])
+        self.assertEqual(parser.last_id, "")
+
+    def test_utf8_split(self):
+        parser = EventParser()
+        data = "data: é\n\n".encode()
+        events = parser.feed(data[:7]) + parser.feed(data[7:])
+        self.assertEqual(events[0].data, "é")
+
+if __name__ == "__main__":
+    unittest.main()
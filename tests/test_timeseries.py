@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from ctfd.utils import ScoreSeries, ScoreboardEntryModel
+
+def board(*scores) -> list:
+    """
+    Scoreboard with the given (name, score) entries, account ids assigned by name.
+    """
+    return [ScoreboardEntryModel(pos, name, score, account_id=ord(name[0])) for pos, (name, score) in enumerate(scores, start=1)]
+
+class ScoreSeriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scores.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, *samples) -> ScoreSeries:
+        series = ScoreSeries(self.path, repair=True)
+        for when, entries in samples:
+            series.record(entries, when)
+        return series
+
+    def test_replay(self):
+        self.assertEqual(self.record((10, board(("a", 100), ("b", 0)))).record(board(("a", 100), ("b", 0)), 20), 0)
+
+        series = ScoreSeries(self.path)
+        self.assertEqual(series.samples, 2)
+        self.assertEqual((series.first, series.last), (10, 20))
+        self.assertEqual([name for _, name in series.teams], ["a", "b"])
+        self.assertEqual(list(series.scores), [100, 0])
+
+    def test_rename(self):
+        self.record((10, board(("a", 100))))
+        series = ScoreSeries(self.path, repair=True)
+        series.record([ScoreboardEntryModel(1, "renamed", 150, account_id=ord("a"))], 20)
+
+        series = ScoreSeries(self.path)
+        self.assertEqual(series.teams, [[ord("a"), "renamed"]])
+        self.assertEqual(list(series.scores), [150])
+        self.assertEqual(series.find("renamed"), series.find(str(ord("a"))))
+
+    def test_truncated_record(self):
+        self.record((10, board(("a", 100), ("b", 50))), (20, board(("a", 100), ("b", 200))))
+        size = os.path.getsize(self.path)
+        with open(self.path, "ab") as fp:
+            # Half of a sample of an interrupted run
+            fp.write(b"S\x00\x00")
+
+        # Readers leave the file alone, the recorder may still be appending to it.
+        series = ScoreSeries(self.path)
+        self.assertEqual(series.samples, 2)
+        self.assertEqual(os.path.getsize(self.path), size + 3)
+
+        series = ScoreSeries(self.path, repair=True)
+        self.assertEqual(os.path.getsize(self.path), size)
+        series.record(board(("a", 300), ("b", 200)), 30)
+        self.assertEqual(list(ScoreSeries(self.path).scores), [300, 200])
+
+    def test_ties_go_to_the_first(self):
+        series = self.record((10, board(("a", 0), ("b", 100))), (20, board(("a", 100), ("b", 100))))
+        self.assertEqual(series.trajectory(series.find("a")), [(10, 0, 2), (20, 100, 2)])
+        self.assertEqual(series.trajectory(series.find("b")), [(10, 100, 1)])
+
+    def test_rank_changes(self):
+        series = self.record(
+            (10, board(("a", 100), ("b", 50))),
+            (20, board(("a", 100), ("b", 150))),
+            (30, board(("a", 100), ("b", 150), ("c", 500)))
+        )
+
+        # Whole series: from the first sample
+        changes = {name: change for name, *change in series.rank_changes()}
+        self.assertEqual(changes["a"], [1, 3, 100, 100])
+        self.assertEqual(changes["b"], [2, 2, 50, 150])
+        self.assertEqual(changes["c"], [None, 1, None, 500])
+        # Biggest climbers first, the teams that showed up during the window count as coming from last
+        self.assertEqual([name for name, *_ in series.rank_changes()], ["c", "b", "a"])
+
+        # From right before the sample at 20
+        changes = {name: change for name, *change in series.rank_changes(since=15)}
+        self.assertEqual(changes["a"], [1, 3, 100, 100])
+        self.assertEqual(changes["b"], [2, 2, 50, 150])
+
+        # Starting at the latest sample
+        changes = {name: change for name, *change in series.rank_changes(since=30)}
+        self.assertEqual(changes["b"], [1, 2, 150, 150])
+
+    def test_rank_changes_empty_window(self):
+        series = self.record((10, board(("a", 100))), (20, board(("a", 200))))
+        self.assertEqual(series.rank_changes(since=25), [])
+        self.assertEqual(ScoreSeries(os.path.join(self.tmp.name, "missing.bin")).rank_changes(since=0), [])
+
+if __name__ == "__main__":
+    unittest.main()